@@ -5,9 +5,14 @@ Interfaz Gráfica para Sistema de Gestión de Pagos
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, scrolledtext, messagebox
+from tkinter import ttk, filedialog, messagebox
 import os
-from payment_manager import PaymentManager
+import sys
+import queue
+import subprocess
+from collections import deque
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # Intentar importar tkinterdnd2
 try:
@@ -16,136 +21,214 @@ try:
 except ImportError:
     DND_AVAILABLE = False
 
+# A partir de cuántos archivos conviene parsear en procesos separados
+# (con menos, el costo de serializar el trabajo no compensa)
+PROCESS_POOL_MIN_FILES = 4
+
+# Máximo de procesos del pool de parsing (en Windows ProcessPoolExecutor admite hasta 61)
+PROCESS_POOL_MAX_WORKERS = 61
+
+# Cada cuántas entradas acumuladas se guardan en el Excel durante un lote de pagos
+ADD_CHUNK_ENTRIES = 1000
+
+# Extensiones aceptadas al soltar archivos en cada zona
+EXTS_TXT = ('.txt',)
+EXTS_XLSX = ('.xlsx',)
+
+# Ventana (ms) para agrupar varios drops seguidos en un solo lote
+DROP_DEBOUNCE_MS = 150
+
+# Fuentes compartidas por los widgets
+FONT_TITLE = ('Segoe UI', 16, 'bold')
+FONT_ZONE = ('Segoe UI', 12, 'bold')
+FONT_INFO = ('Segoe UI', 9)
+FONT_BODY = ('Segoe UI', 10)
+FONT_LOG = ('Consolas', 9)
+
+# ttk.Style compartido; se crea y configura en el primer setup_styles
+_style = None
+
 
 class PaymentGUI:
     """Interfaz gráfica para el sistema de gestión de pagos"""
     
+    COLORS = {
+        'bg_primary': '#ffffff',
+        'bg_secondary': '#fafafa',
+        'text_primary': '#424242',
+        'text_secondary': '#757575',
+        'border': '#e0e0e0'
+    }
+    
+    # Tipos de archivo de los diálogos de selección
+    _FILE_TYPES = [("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
+    _EXCEL_TYPES = [("Archivos Excel", "*.xlsx"), ("Todos los archivos", "*.*")]
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Sistema de Gestión de Pagos")
         self.root.geometry("1200x800")
         self.root.resizable(True, True)
         
-        self.manager = PaymentManager()
+        # El manager se crea en el primer ciclo idle (ver _init_manager); lo que se suelte
+        # antes se guarda como (función, archivos) y se procesa al terminar de cargar
+        self.manager = None
+        self._waiting_manager = []
+        
+        # Pool de hilos para el trabajo con archivos; los resultados regresan
+        # al hilo de Tk a través de result_q (los hilos nunca tocan widgets)
+        self.pool = ThreadPoolExecutor(max_workers=8)
+        self.result_q = queue.Queue()
+        # Pipe con el que los hilos despiertan a Tk al dejar un resultado (POSIX)
+        self._wake_r = self._wake_w = None
+        # Pool de procesos para el parsing (CPU) cuando se sueltan muchos archivos;
+        # se crea con el primer lote que lo necesita (ver _get_cpu_pool)
+        self.cpu_pool = None
+        
+        # Buffer del log: las líneas se acumulan y se insertan juntas en idle
+        self._log_buf = deque()
+        self._flush_scheduled = False
+        
+        # Archivos soltados pendientes de procesar, por zona (ver _debounce_drop)
+        self._pending_drops = {'payment': [], 'confirmation': []}
+        self._drop_after_ids = {'payment': None, 'confirmation': None}
+        
+        # Última carpeta elegida en los diálogos de selección
+        self._last_dir = None
         
-        self.colors = {
-            'bg_primary': '#ffffff',
-            'bg_secondary': '#fafafa',
-            'text_primary': '#424242',
-            'text_secondary': '#757575',
-            'border': '#e0e0e0'
-        }
+        # Si Pagos.xlsx existe; None = no se sabe todavía (ver check_pagos_excel_exists)
+        self._excel_exists_cache = None
+        
+        # Estado actual de la zona de montos (None = aún no se aplica ninguno)
+        self._monto_enabled = None
+        self._monto_click = lambda e: self.select_monto_file()
+        
+        self.colors = PaymentGUI.COLORS
         
         self.setup_ui()
+        self._start_queue_listener()
+        self.root.after_idle(self._init_manager)
+        
+    def _init_manager(self):
+        """Crea el PaymentManager una vez pintada la ventana y habilita las acciones"""
+        # Importar aquí: payment_manager carga pandas/openpyxl, que tardan en importarse
+        from payment_manager import PaymentManager
+        self.manager = PaymentManager()
+        self.btn_excel.config(state='normal')
+        self.btn_clear.config(state='normal')
+        # Verificar estado inicial de zona de montos
+        self.update_monto_zone_state()
+        
+        # Procesar los archivos recibidos mientras se cargaba el sistema
+        waiting, self._waiting_manager = self._waiting_manager, []
+        for func, filepaths in waiting:
+            func(filepaths)
         
     def setup_ui(self):
         """Configura la interfaz principal"""
         self.root.configure(bg=self.colors['bg_primary'])
         
+        # Layout con grid en la ventana: encabezado arriba, las tres zonas a la
+        # izquierda y log + botones en la cuarta columna
+        self.root.rowconfigure(1, weight=1)
+        for column in range(4):
+            self.root.columnconfigure(column, weight=1)
+        
         self.setup_styles()
         self.setup_header()
-        self.setup_payment_zone()
-        self.setup_confirmation_zone()
-        self.setup_monto_zone()
+        self.setup_drop_zones()
         self.setup_logs()
         self.setup_buttons()
-        # Verificar estado inicial de zona de montos
-        self.update_monto_zone_state()
         
     def setup_styles(self):
-        """Configura los estilos de los widgets"""
-        style = ttk.Style()
-        style.theme_use('clam')
-        
-        style.configure('Title.TLabel',
-                       font=('Segoe UI', 16, 'bold'),
-                       background=self.colors['bg_primary'],
-                       foreground=self.colors['text_primary'])
-        
-        style.configure('Zone.TLabel',
-                       font=('Segoe UI', 12, 'bold'),
-                       background=self.colors['bg_secondary'],
-                       foreground=self.colors['text_primary'])
-        
-        style.configure('Info.TLabel',
-                       font=('Segoe UI', 9),
-                       background=self.colors['bg_primary'],
-                       foreground=self.colors['text_secondary'])
-        
-        style.configure('Action.TButton',
-                       font=('Segoe UI', 10),
-                       padding=10)
-        
-        style.map('Action.TButton',
-                 foreground=[('active', '#ffffff'),
-                           ('pressed', '#ffffff')],
-                 background=[('active', '#1565c0'),
-                           ('pressed', '#0d47a1')])
+        """Configura los estilos de los widgets (una sola vez por proceso)"""
+        global _style
+        if _style is not None:
+            self.style = _style
+            return
+        
+        self.style = _style = ttk.Style()
+        _style.theme_use('clam')
+        
+        # Todos los estilos en una sola llamada sobre el tema activo
+        _style.theme_settings('clam', {
+            'Title.TLabel': {
+                'configure': {'font': FONT_TITLE,
+                              'background': self.colors['bg_primary'],
+                              'foreground': self.colors['text_primary']}
+            },
+            'Zone.TLabel': {
+                'configure': {'font': FONT_ZONE,
+                              'background': self.colors['bg_secondary'],
+                              'foreground': self.colors['text_primary']}
+            },
+            'Info.TLabel': {
+                'configure': {'font': FONT_INFO,
+                              'background': self.colors['bg_primary'],
+                              'foreground': self.colors['text_secondary']}
+            },
+            'Action.TButton': {
+                'configure': {'font': FONT_BODY,
+                              'padding': 10},
+                'map': {'foreground': [('active', '#ffffff'),
+                                       ('pressed', '#ffffff')],
+                        'background': [('active', '#1565c0'),
+                                       ('pressed', '#0d47a1')]}
+            },
+        })
         
     def setup_header(self):
         """Configura el encabezado"""
         header = tk.Frame(self.root, bg=self.colors['bg_primary'], pady=20)
-        header.pack(fill=tk.X)
+        header.grid(row=0, column=0, columnspan=4, sticky='ew')
         
         title = ttk.Label(header, 
                          text="Sistema de Gestión de Pagos WhatsApp",
                          style='Title.TLabel')
         title.pack()
         
-    def setup_payment_zone(self):
-        """Configura la zona de carga de pagos (izquierda)"""
-        container = tk.Frame(self.root, bg=self.colors['bg_primary'])
-        container.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        frame = tk.Frame(container, bg=self.colors['bg_secondary'], 
-                        relief=tk.RAISED, bd=2)
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        title = ttk.Label(frame, text="Subir Pagos", style='Zone.TLabel')
-        title.pack(pady=15)
-        
-        zone = tk.Frame(frame, bg=self.colors['bg_secondary'], 
-                       relief=tk.SUNKEN, bd=1, width=400, height=200)
-        zone.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-        
-        zone_label = tk.Label(zone, 
-                             text="Arrastra archivos .txt aquí\n\n"
-                                 "o haz clic para seleccionar archivos",
-                             bg=self.colors['bg_secondary'],
-                             fg=self.colors['text_secondary'],
-                             font=('Segoe UI', 10),
-                             justify=tk.CENTER)
-        zone_label.pack(expand=True)
-        
-        self.payment_zone = zone
-        self.payment_label = zone_label
-        
-        self.payment_zone.bind("<Button-1>", lambda e: self.select_payment_files())
-        self.payment_label.bind("<Button-1>", lambda e: self.select_payment_files())
+    def setup_drop_zones(self):
+        """Configura las tres zonas de carga (pagos, confirmaciones y montos)"""
+        # Los destinos de drag & drop se registran cuando arranca el loop (ver _register_dnd)
+        self._dnd_targets = []
+        
+        self.payment_zone, self.payment_label = self._make_drop_zone(
+            0, "Subir Pagos",
+            "Arrastra archivos .txt aquí\n\n"
+            "o haz clic para seleccionar archivos",
+            self.select_payment_files, self.on_drop_payment,
+            "Formatos soportados: .txt\n"
+            "Se extraerán los pagos del archivo"
+        )
+        self.confirmation_zone, self.confirmation_label = self._make_drop_zone(
+            1, "Subir Confirmaciones",
+            "Arrastra archivos .txt aquí\n\n"
+            "o haz clic para seleccionar archivos",
+            self.select_confirmation_files, self.on_drop_confirmation,
+            "Formatos soportados: .txt\n"
+            "Se marcarán como confirmados"
+        )
+        self.monto_zone, self.monto_label = self._make_drop_zone(
+            2, "Subir Excel de Montos",
+            "Primero genera Pagos.xlsx\nprocesando pagos",
+            self.select_monto_file, self.on_drop_monto,
+            "Formato soportado: .xlsx\n"
+            "Archivo de montos autorizados"
+        )
         
         if DND_AVAILABLE:
-            try:
-                zone.drop_target_register(DND_FILES)
-                zone.dnd_bind('<<Drop>>', self.on_drop_payment)
-            except:
-                pass
+            self.root.after(0, self._register_dnd)
         
-        info = ttk.Label(frame, 
-                        text="Formatos soportados: .txt\n"
-                            "Se extraerán los pagos del archivo",
-                        style='Info.TLabel')
-        info.pack(pady=10)
-        
-    def setup_confirmation_zone(self):
-        """Configura la zona de carga de confirmaciones (derecha)"""
+    def _make_drop_zone(self, column, title_text, placeholder, click_cb, drop_cb, info_text):
+        """Crea una zona de carga en la columna indicada; retorna (zona, etiqueta)"""
         container = tk.Frame(self.root, bg=self.colors['bg_primary'])
-        container.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        container.grid(row=1, column=column, rowspan=2, sticky='nsew', padx=10, pady=10)
         
         frame = tk.Frame(container, bg=self.colors['bg_secondary'], 
                         relief=tk.RAISED, bd=2)
         frame.pack(fill=tk.BOTH, expand=True)
         
-        title = ttk.Label(frame, text="Subir Confirmaciones", style='Zone.TLabel')
+        title = ttk.Label(frame, text=title_text, style='Zone.TLabel')
         title.pack(pady=15)
         
         zone = tk.Frame(frame, bg=self.colors['bg_secondary'], 
@@ -153,83 +236,56 @@ class PaymentGUI:
         zone.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
         zone_label = tk.Label(zone, 
-                             text="Arrastra archivos .txt aquí\n\n"
-                                 "o haz clic para seleccionar archivos",
+                             text=placeholder,
                              bg=self.colors['bg_secondary'],
                              fg=self.colors['text_secondary'],
-                             font=('Segoe UI', 10),
+                             font=FONT_BODY,
                              justify=tk.CENTER)
         zone_label.pack(expand=True)
         
-        self.confirmation_zone = zone
-        self.confirmation_label = zone_label
-        
-        self.confirmation_zone.bind("<Button-1>", lambda e: self.select_confirmation_files())
-        self.confirmation_label.bind("<Button-1>", lambda e: self.select_confirmation_files())
+        zone.bind("<Button-1>", lambda e: click_cb())
+        zone_label.bind("<Button-1>", lambda e: click_cb())
         
-        if DND_AVAILABLE:
-            try:
-                zone.drop_target_register(DND_FILES)
-                zone.dnd_bind('<<Drop>>', self.on_drop_confirmation)
-            except:
-                pass
+        self._dnd_targets.append((zone, drop_cb))
         
         info = ttk.Label(frame, 
-                        text="Formatos soportados: .txt\n"
-                            "Se marcarán como confirmados",
+                        text=info_text,
                         style='Info.TLabel')
         info.pack(pady=10)
         
-    def setup_monto_zone(self):
-        """Configura la zona de carga de Excel de montos"""
-        container = tk.Frame(self.root, bg=self.colors['bg_primary'])
-        container.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        frame = tk.Frame(container, bg=self.colors['bg_secondary'], 
-                        relief=tk.RAISED, bd=2)
-        frame.pack(fill=tk.BOTH, expand=True)
-        
-        title = ttk.Label(frame, text="Subir Excel de Montos", style='Zone.TLabel')
-        title.pack(pady=15)
+        return zone, zone_label
         
-        zone = tk.Frame(frame, bg=self.colors['bg_secondary'], 
-                       relief=tk.SUNKEN, bd=1, width=400, height=200)
-        zone.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-        
-        zone_label = tk.Label(zone, 
-                             text="Primero genera Pagos.xlsx\nprocesando pagos",
-                             bg=self.colors['bg_secondary'],
-                             fg=self.colors['text_secondary'],
-                             font=('Segoe UI', 10),
-                             justify=tk.CENTER)
-        zone_label.pack(expand=True)
-        
-        self.monto_zone = zone
-        self.monto_label = zone_label
-        
-        self.monto_zone.bind("<Button-1>", lambda e: self.select_monto_file())
-        self.monto_label.bind("<Button-1>", lambda e: self.select_monto_file())
-        
-        if DND_AVAILABLE:
+    def _register_dnd(self):
+        """Registra las zonas como destino de drag & drop"""
+        for zone, drop_cb in self._dnd_targets:
             try:
                 zone.drop_target_register(DND_FILES)
-                zone.dnd_bind('<<Drop>>', self.on_drop_monto)
+                zone.dnd_bind('<<Drop>>', drop_cb)
             except:
                 pass
         
-        info = ttk.Label(frame, 
-                        text="Formato soportado: .xlsx\n"
-                            "Archivo de montos autorizados",
-                        style='Info.TLabel')
-        info.pack(pady=10)
-        
+    def _wait_for_manager(self, func, filepaths):
+        """Guarda archivos recibidos antes de que el manager exista (ver _init_manager)"""
+        self.log(f"El sistema aún se está cargando; {len(filepaths)} archivo(s) se procesarán en cuanto termine")
+        self._waiting_manager.append((func, list(filepaths)))
+    
     def check_pagos_excel_exists(self) -> bool:
-        """Verifica si existe el archivo Excel de pagos"""
-        return os.path.exists(self.manager.excel_path)
+        """Verifica si existe el archivo Excel de pagos (se consulta el disco solo la primera vez)"""
+        if self.manager is None:
+            return False
+        if self._excel_exists_cache is None:
+            self._excel_exists_cache = os.path.exists(self.manager.excel_path)
+        return self._excel_exists_cache
     
     def update_monto_zone_state(self):
         """Habilita o deshabilita la zona de montos según exista Pagos.xlsx"""
-        if self.check_pagos_excel_exists():
+        enabled = self.check_pagos_excel_exists()
+        # Solo tocar los widgets cuando el estado cambia
+        if enabled == self._monto_enabled:
+            return
+        self._monto_enabled = enabled
+        
+        if enabled:
             # Habilitar zona - cambiar texto y color
             self.monto_label.config(
                 text="Arrastra archivo Excel aquí\n\n"
@@ -237,8 +293,8 @@ class PaymentGUI:
                 fg=self.colors['text_primary']
             )
             # Habilitar eventos de click
-            self.monto_zone.bind("<Button-1>", lambda e: self.select_monto_file())
-            self.monto_label.bind("<Button-1>", lambda e: self.select_monto_file())
+            self.monto_zone.bind("<Button-1>", self._monto_click)
+            self.monto_label.bind("<Button-1>", self._monto_click)
         else:
             # Deshabilitar zona - cambiar texto y color
             self.monto_label.config(
@@ -252,46 +308,79 @@ class PaymentGUI:
     def setup_logs(self):
         """Configura el área de logs"""
         container = tk.Frame(self.root, bg=self.colors['bg_primary'])
-        container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        container.grid(row=1, column=3, sticky='nsew', padx=10, pady=10)
         
         label = ttk.Label(container, text="Log de Actividad", 
                          style='Zone.TLabel')
         label.pack(anchor=tk.W, pady=(0, 5))
         
-        self.log_text = scrolledtext.ScrolledText(
-            container,
-            wrap=tk.WORD,
+        # Text sin ajuste de línea: agregar al final no obliga a re-acomodar el texto
+        text_frame = tk.Frame(container, bg=self.colors['bg_primary'])
+        text_frame.pack(fill=tk.BOTH, expand=True)
+        text_frame.rowconfigure(0, weight=1)
+        text_frame.columnconfigure(0, weight=1)
+        
+        self.log_text = tk.Text(
+            text_frame,
+            wrap=tk.NONE,
             width=80,
             height=10,
             bg='#ffffff',
             fg=self.colors['text_primary'],
-            font=('Consolas', 9),
+            font=FONT_LOG,
             relief=tk.SUNKEN,
-            bd=1
+            bd=1,
+            undo=False
         )
-        self.log_text.pack(fill=tk.BOTH, expand=True)
+        yscroll = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self.log_text.yview)
+        xscroll = ttk.Scrollbar(text_frame, orient=tk.HORIZONTAL, command=self.log_text.xview)
+        self.log_text.configure(yscrollcommand=yscroll.set, xscrollcommand=xscroll.set)
+        
+        self.log_text.grid(row=0, column=0, sticky='nsew')
+        yscroll.grid(row=0, column=1, sticky='ns')
+        xscroll.grid(row=1, column=0, sticky='ew')
+        
+        self.log_text.tag_configure('error', foreground='#c62828')
+        self.log_text.tag_configure('alert', foreground='#ef6c00')
+        
+        # Métodos del widget usados en cada volcado del log
+        self._text_insert = self.log_text.insert
+        self._text_see = self.log_text.see
+        
+        # Máximo de líneas que conserva el log; al pasarlo se descartan las más
+        # antiguas de a _log_trim_lines para no recortar en cada volcado
+        self._max_log_lines = 2000
+        self._log_trim_lines = 500
+        
+        # Avance de los archivos de pagos en proceso; visible solo mientras hay trabajo
+        self.progress = ttk.Progressbar(container, mode='determinate')
+        self._progress_total = 0
+        self._progress_done = 0
         
         self.log("Sistema iniciado correctamente")
         
     def setup_buttons(self):
         """Configura los botones de acción"""
         container = tk.Frame(self.root, bg=self.colors['bg_primary'])
-        container.pack(fill=tk.X, padx=10, pady=10)
+        container.grid(row=2, column=3, sticky='ew', padx=10, pady=10)
         
         btn_frame = tk.Frame(container, bg=self.colors['bg_primary'])
         btn_frame.pack()
         
-        btn_excel = ttk.Button(btn_frame, 
-                              text="Ver Excel",
-                              style='Action.TButton',
-                              command=self.view_excel)
-        btn_excel.pack(side=tk.LEFT, padx=5)
-        
-        btn_clear = ttk.Button(btn_frame,
-                              text="Limpiar Registros",
-                              style='Action.TButton',
-                              command=self.clear_data)
-        btn_clear.pack(side=tk.LEFT, padx=5)
+        # Deshabilitados hasta que el manager esté listo
+        self.btn_excel = ttk.Button(btn_frame, 
+                                   text="Ver Excel",
+                                   style='Action.TButton',
+                                   command=self.view_excel,
+                                   state='disabled')
+        self.btn_excel.pack(side=tk.LEFT, padx=5)
+        
+        self.btn_clear = ttk.Button(btn_frame,
+                                   text="Limpiar Registros",
+                                   style='Action.TButton',
+                                   command=self.clear_data,
+                                   state='disabled')
+        self.btn_clear.pack(side=tk.LEFT, padx=5)
         
         btn_exit = ttk.Button(btn_frame,
                              text="Salir",
@@ -303,18 +392,22 @@ class PaymentGUI:
         """Abre diálogo para seleccionar archivos de pagos"""
         files = filedialog.askopenfilenames(
             title="Seleccionar Archivos de Pagos",
-            filetypes=[("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
+            filetypes=PaymentGUI._FILE_TYPES,
+            initialdir=self._last_dir
         )
         if files:
+            self._last_dir = os.path.dirname(files[0])
             self.process_payments(files)
             
     def select_confirmation_files(self):
         """Abre diálogo para seleccionar archivos de confirmaciones"""
         files = filedialog.askopenfilenames(
             title="Seleccionar Archivos de Confirmaciones",
-            filetypes=[("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
+            filetypes=PaymentGUI._FILE_TYPES,
+            initialdir=self._last_dir
         )
         if files:
+            self._last_dir = os.path.dirname(files[0])
             self.process_confirmations(files)
     
     def select_monto_file(self):
@@ -328,30 +421,44 @@ class PaymentGUI:
         
         file = filedialog.askopenfilename(
             title="Seleccionar Archivo Excel de Montos",
-            filetypes=[("Archivos Excel", "*.xlsx"), ("Todos los archivos", "*.*")]
+            filetypes=PaymentGUI._EXCEL_TYPES,
+            initialdir=self._last_dir
         )
         if file:
+            self._last_dir = os.path.dirname(file)
             self.process_monto_file(file)
             
+    def _validate_drop(self, event, exts):
+        """Rutas soltadas en event cuya extensión está en exts (sin importar mayúsculas)"""
+        return [f for f in self.root.tk.splitlist(event.data) if f.lower().endswith(exts)]
+            
     def on_drop_payment(self, event):
         """Maneja el evento de arrastrar y soltar en zona de pagos"""
-        files = self.root.tk.splitlist(event.data)
-        valid_files = []
-        for filepath in files:
-            if filepath.lower().endswith('.txt'):
-                valid_files.append(filepath)
+        valid_files = self._validate_drop(event, EXTS_TXT)
         if valid_files:
-            self.process_payments(valid_files)
+            self._debounce_drop('payment', valid_files, self.process_payments)
             
     def on_drop_confirmation(self, event):
         """Maneja el evento de arrastrar y soltar en zona de confirmaciones"""
-        files = self.root.tk.splitlist(event.data)
-        valid_files = []
-        for filepath in files:
-            if filepath.lower().endswith('.txt'):
-                valid_files.append(filepath)
+        valid_files = self._validate_drop(event, EXTS_TXT)
         if valid_files:
-            self.process_confirmations(valid_files)
+            self._debounce_drop('confirmation', valid_files, self.process_confirmations)
+    
+    def _debounce_drop(self, kind, files, handler):
+        """Acumula archivos soltados y reprograma el procesamiento del lote"""
+        self._pending_drops[kind].extend(files)
+        if self._drop_after_ids[kind] is not None:
+            self.root.after_cancel(self._drop_after_ids[kind])
+        self._drop_after_ids[kind] = self.root.after(
+            DROP_DEBOUNCE_MS, self._flush_drops, kind, handler
+        )
+    
+    def _flush_drops(self, kind, handler):
+        """Procesa en un solo lote los archivos acumulados (sin repetidos)"""
+        self._drop_after_ids[kind] = None
+        files = list(dict.fromkeys(self._pending_drops[kind]))
+        self._pending_drops[kind].clear()
+        handler(files)
     
     def on_drop_monto(self, event):
         """Maneja el evento de arrastrar y soltar en zona de montos"""
@@ -362,72 +469,164 @@ class PaymentGUI:
             )
             return
         
-        files = self.root.tk.splitlist(event.data)
-        valid_files = []
-        for filepath in files:
-            if filepath.lower().endswith('.xlsx'):
-                valid_files.append(filepath)
+        valid_files = self._validate_drop(event, EXTS_XLSX)
         if valid_files:
             self.process_monto_file(valid_files[0])  # Solo procesar el primer archivo
             
     def process_payments(self, filepaths):
-        """Procesa los archivos de pagos"""
+        """Procesa los archivos de pagos en segundo plano"""
+        if self.manager is None:
+            self._wait_for_manager(self.process_payments, filepaths)
+            return
         self.log(f"Procesando {len(filepaths)} archivo(s) de pagos...")
         
-        all_entries = []
-        total_errors = 0
-        total_duplicates = 0
-        
-        for filepath in filepaths:
-            self.log(f"Archivo: {os.path.basename(filepath)}")
-            
-            entries, errors, duplicates = self.manager.process_file(filepath)
-            
-            all_entries.extend(entries)
-            total_errors += errors
-            total_duplicates += duplicates
-            
-            self.log(f"  -> Entradas extraídas: {len(entries)}")
-            self.log(f"  -> Errores: {errors}")
-            self.log(f"  -> Duplicados: {duplicates}")
-        
-        if all_entries:
-            self.log("Agregando entradas al Excel...")
-            num_added = self.manager.add_to_excel(all_entries)
-            self.log(f"Total de registros en Excel: {num_added}")
-            
-            # Actualizar estado de zona de montos después de crear/actualizar Excel
-            self.update_monto_zone_state()
-            
-            messagebox.showinfo(
-                "Pagos Procesados",
-                f"Se procesaron {len(all_entries)} entradas\n"
-                f"Total de registros en Excel: {num_added}"
+        # 'entries' acumula lo aún no guardado; se guarda por bloques de ADD_CHUNK_ENTRIES,
+        # en orden y de uno en uno ('to_save' / 'saving')
+        batch = {'pending': len(filepaths), 'entries': [], 'errors': 0, 'duplicates': 0,
+                 'count': 0, 'to_save': deque(), 'saving': False, 'num_added': 0}
+        executor = self._get_cpu_pool() if len(filepaths) >= PROCESS_POOL_MIN_FILES else None
+        names = list(map(os.path.basename, filepaths))
+        self._progress_start(len(filepaths))
+        
+        for i, filepath in enumerate(filepaths):
+            self._submit(
+                lambda future, name=names[i]: self._on_payment_file_done(batch, name, future),
+                self.manager.process_file, filepath, executor
             )
+    
+    def _get_cpu_pool(self):
+        """Pool de procesos para el parsing; se crea la primera vez que se usa"""
+        if self.cpu_pool is None:
+            workers = min(PROCESS_POOL_MAX_WORKERS, os.cpu_count() or 1)
+            self.cpu_pool = ProcessPoolExecutor(max_workers=workers)
+        return self.cpu_pool
+    
+    def _on_payment_file_done(self, batch, name, future):
+        """Registra el resultado de un archivo de pagos (hilo de Tk)"""
+        self.log(f"Archivo: {name}")
+        
+        try:
+            entries, errors, duplicates = future.result()
+        except Exception as e:
+            self.log(f"  -> Error procesando archivo: {e}")
+            entries, errors, duplicates = [], 1, 0
+        
+        batch['entries'].extend(entries)
+        batch['count'] += len(entries)
+        batch['errors'] += errors
+        batch['duplicates'] += duplicates
+        
+        self.log(f"  -> Entradas extraídas: {len(entries)}")
+        self.log(f"  -> Errores: {errors}")
+        self.log(f"  -> Duplicados: {duplicates}")
+        
+        batch['pending'] -= 1
+        self._progress_step()
+        
+        if len(batch['entries']) >= ADD_CHUNK_ENTRIES or (batch['pending'] == 0 and batch['entries']):
+            if batch['count'] == len(batch['entries']) and batch['pending'] == 0:
+                self.log("Agregando entradas al Excel...")
+            else:
+                self.log(f"Guardando bloque de {len(batch['entries'])} entradas en el Excel...")
+            batch['to_save'].append(batch['entries'])
+            batch['entries'] = []
+            if not batch['saving']:
+                self._save_next_chunk(batch)
+        elif batch['pending'] == 0 and not batch['saving']:
+            if batch['count']:
+                # Todo se guardó en bloques anteriores
+                self._on_payments_saved(batch)
+            else:
+                self.log("No se encontraron pagos válidos en los archivos")
+                messagebox.showwarning(
+                    "Sin Resultados",
+                    "No se encontraron pagos válidos en los archivos seleccionados"
+                )
+    
+    def _save_next_chunk(self, batch):
+        """Guarda el siguiente bloque pendiente del lote, o cierra el lote si ya no hay más"""
+        if not batch['to_save']:
+            batch['saving'] = False
+            if batch['pending'] == 0:
+                self._on_payments_saved(batch)
+            return
+        
+        batch['saving'] = True
+        chunk = batch['to_save'].popleft()
+        self._submit(
+            lambda future: self._on_chunk_saved(batch, future),
+            self.manager.add_to_excel, chunk
+        )
+    
+    def _on_chunk_saved(self, batch, future):
+        """Registra el guardado de un bloque y continúa con el siguiente (hilo de Tk)"""
+        try:
+            batch['num_added'] = future.result()
+            # Con registros guardados el Excel existe; si no, se vuelve a consultar el disco
+            self._excel_exists_cache = True if batch['num_added'] else None
+        except Exception as e:
+            self.log(f"Error agregando entradas al Excel: {e}")
+            self._excel_exists_cache = None
+        
+        self._save_next_chunk(batch)
+    
+    def _on_payments_saved(self, batch):
+        """Informa el resultado de guardar los pagos del lote en Excel (hilo de Tk)"""
+        num_added = batch['num_added']
+        self.log(f"Total de registros en Excel: {num_added}")
+        
+        # Actualizar estado de zona de montos después de crear/actualizar Excel
+        self.update_monto_zone_state()
+        
+        messagebox.showinfo(
+            "Pagos Procesados",
+            f"Se procesaron {batch['count']} entradas\n"
+            f"Total de registros en Excel: {num_added}"
+        )
+    
+    def _progress_start(self, total):
+        """Suma archivos a la barra de avance y la muestra"""
+        if not self._progress_total:
+            self.progress.pack(fill=tk.X, pady=(5, 0))
+        self._progress_total += total
+        self.progress.configure(maximum=self._progress_total, value=self._progress_done)
+    
+    def _progress_step(self):
+        """Avanza la barra un archivo; la oculta al terminar todo lo pendiente"""
+        self._progress_done += 1
+        if self._progress_done >= self._progress_total:
+            self._progress_total = self._progress_done = 0
+            self.progress.pack_forget()
         else:
-            self.log("No se encontraron pagos válidos en los archivos")
-            messagebox.showwarning(
-                "Sin Resultados",
-                "No se encontraron pagos válidos en los archivos seleccionados"
-            )
+            self.progress.configure(value=self._progress_done)
             
     def process_confirmations(self, filepaths):
-        """Procesa los archivos de confirmaciones"""
+        """Procesa los archivos de confirmaciones en segundo plano"""
+        if self.manager is None:
+            self._wait_for_manager(self.process_confirmations, filepaths)
+            return
         self.log(f"Procesando {len(filepaths)} archivo(s) de confirmaciones...")
         
-        all_confirmed = []
-        all_alerts = []
+        names = list(map(os.path.basename, filepaths))
         
-        for filepath in filepaths:
-            self.log(f"Archivo: {os.path.basename(filepath)}")
-            
-            confirmed, alerts = self.manager.process_confirmations(filepath)
-            
-            all_confirmed.extend(confirmed)
-            all_alerts.extend(alerts)
-            
-            self.log(f"  -> Confirmaciones: {len(confirmed)}")
-            self.log(f"  -> Alertas: {len(alerts)}")
+        # Un solo trabajo para todo el lote: el Excel se abre y guarda una vez
+        self._submit(
+            lambda future: self._on_confirmations_done(names, future),
+            self.manager.process_confirmations_batch, list(filepaths)
+        )
+    
+    def _on_confirmations_done(self, names, future):
+        """Registra el resultado de un lote de confirmaciones (hilo de Tk)"""
+        for name in names:
+            self.log(f"Archivo: {name}")
+        
+        try:
+            all_confirmed, all_alerts = future.result()
+        except Exception as e:
+            all_confirmed, all_alerts = [], [f"Error procesando confirmaciones: {e}"]
+        
+        self.log(f"  -> Confirmaciones: {len(all_confirmed)}")
+        self.log(f"  -> Alertas: {len(all_alerts)}")
         
         if all_alerts:
             self.log("Alertas encontradas:")
@@ -454,7 +653,7 @@ class PaymentGUI:
                 )
     
     def process_monto_file(self, filepath):
-        """Procesa el archivo Excel de montos y actualiza Pagos.xlsx"""
+        """Procesa el archivo Excel de montos y actualiza Pagos.xlsx en segundo plano"""
         if not self.check_pagos_excel_exists():
             messagebox.showwarning(
                 "Excel No Existe",
@@ -463,67 +662,52 @@ class PaymentGUI:
             return
         
         self.log(f"Procesando archivo de montos: {os.path.basename(filepath)}")
-        
-        # Cargar archivo de montos
-        success = self.manager.load_monto_file(filepath)
-        
-        if not success:
-            self.log("Error al cargar archivo de montos")
-            messagebox.showerror(
-                "Error",
-                "No se pudo cargar el archivo de montos.\nRevisa el log para más detalles."
-            )
-            return
-        
-        # Actualizar Excel existente con valores de Pago semanal
-        try:
-            import pandas as pd
+        self._submit(self._on_montos_done, self._update_montos, filepath)
+    
+    def _update_montos(self, filepath):
+        """
+        Carga el archivo de montos y actualiza Pagos.xlsx (se ejecuta en el pool)
+        Retorna (encontrados, actualizados), o None si no se pudo cargar el archivo
+        """
+        import pandas as pd
+        from openpyxl.styles import PatternFill
+        
+        with self.manager.io_lock:
+            # Cargar archivo de montos
+            if not self.manager.load_monto_file(filepath):
+                return None
+            
+            # Actualizar Excel existente con valores de Pago semanal
+            cols_orden = self.manager.PAGOS_COLUMNS
+            # Columnas que se recalculan aquí: no hace falta leerlas
+            recalculadas = {'Pago semanal', 'Pago real', 'Ahorro real'}
             
-            # Leer Excel actual con dtype=str para preservar ceros a la izquierda
+            # Leer Excel actual con dtype=str para preservar ceros a la izquierda,
+            # solo las columnas que se conservan
             df_pagos = pd.read_excel(
                 self.manager.excel_path, 
                 sheet_name='Pagos', 
-                engine='openpyxl',
-                dtype={'ID': str, 'Ciclo': str, 'Depósito': str}
+                engine=self.manager.READ_ENGINE,
+                dtype=self.manager.TEXT_DTYPES,
+                usecols=lambda col: col in cols_orden and col not in recalculadas
             )
             
             # Normalizar ID (ya es string, solo asegurar formato)
             if 'ID' in df_pagos.columns:
-                df_pagos['ID'] = df_pagos['ID'].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '').str.replace('None', '')
-                df_pagos['ID'] = df_pagos['ID'].str.zfill(6)
+                df_pagos['ID'] = self.manager.normalize_id_series(df_pagos['ID'])
             
             # Normalizar Depósito (ya es string, solo asegurar formato de 9 dígitos)
             if 'Depósito' in df_pagos.columns:
-                df_pagos['Depósito'] = df_pagos['Depósito'].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '').str.replace('None', '')
                 # Asegurar formato completo de 9 dígitos
-                def fix_deposito(val):
-                    if pd.isna(val) or val == '' or val == 'nan' or val == 'None':
-                        return None
-                    val_str = str(val).strip()
-                    # Si es numérico y tiene menos de 9 dígitos, rellenar
-                    if val_str.replace('.', '').isdigit():
-                        val_str = val_str.split('.')[0]
-                        if len(val_str) < 9:
-                            val_str = val_str.zfill(9)
-                    return val_str
-                df_pagos['Depósito'] = df_pagos['Depósito'].apply(fix_deposito)
+                df_pagos['Depósito'] = self.manager.normalize_deposito_series(df_pagos['Depósito'])
             
             # Actualizar o agregar columna Pago semanal
-            df_pagos['Pago semanal'] = df_pagos.apply(
-                lambda row: self.manager.get_pago_semanal(
-                    str(row.get('ID', '')).zfill(6),
-                    str(row.get('Tipo', 'Ind')).strip()
-                ), axis=1
-            )
+            df_pagos['Pago semanal'] = self.manager.map_pago_semanal(df_pagos)
             
             # Contar cuántos registros fueron actualizados
             registros_actualizados = len(df_pagos)
             registros_encontrados = len(df_pagos[df_pagos['Pago semanal'] != 'No encontrado'])
             
-            # Guardar Excel actualizado
-            cols_orden = ['Tipo', 'ID', 'Grupo', 'Fecha', 'Hora', 'Pago', 'Ahorro', 'Total', 'Monto Banco',
-                         'Número de Pago', 'Sucursal', 'Corte', 'Ciclo', 'Concepto', 'Depósito', 'Confirmado', 'Pago semanal', 'Pago real', 'Ahorro real']
-            
             # Calcular columna 'Monto Banco' si no existe (por ahora igual a Total)
             if 'Monto Banco' not in df_pagos.columns:
                 if 'Total' in df_pagos.columns:
@@ -570,31 +754,18 @@ class PaymentGUI:
             
             df_pagos['Ahorro real'] = df_pagos.apply(calcular_ahorro_real, axis=1)
             
-            # Asegurar todas las columnas existan
-            for col in cols_orden:
-                if col not in df_pagos.columns:
-                    if col == 'Pago semanal':
-                        df_pagos[col] = 'No encontrado'
-                    else:
-                        df_pagos[col] = None
+            # Reordenar columnas; las que falten se agregan vacías en la misma operación
+            df_pagos = df_pagos.reindex(columns=cols_orden)
+            df_pagos['Pago semanal'] = df_pagos['Pago semanal'].fillna('No encontrado')
             
             # Asegurar que Depósito sea string para preservar ceros a la izquierda
-            if 'Depósito' in df_pagos.columns:
-                df_pagos['Depósito'] = df_pagos['Depósito'].astype(str)
-            
-            # Reordenar columnas
-            df_pagos = df_pagos.reindex(columns=cols_orden)
+            df_pagos['Depósito'] = df_pagos['Depósito'].astype(str)
             
-            # Guardar
+            # Guardar y dar formato a las columnas en la misma escritura; modo append para
+            # conservar las demás hojas (Meta, Pagos Confirmados)
             with pd.ExcelWriter(self.manager.excel_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
                 df_pagos.to_excel(writer, sheet_name='Pagos', index=False)
-            
-            # Configurar formato de columnas en Excel
-            import openpyxl
-            from openpyxl.styles import PatternFill
-            wb = openpyxl.load_workbook(self.manager.excel_path)
-            if 'Pagos' in wb.sheetnames:
-                ws = wb['Pagos']
+                ws = writer.sheets['Pagos']
                 for cell in ws[1]:  # Primera fila (encabezados)
                     if cell.value == 'Depósito':
                         col_letter = cell.column_letter
@@ -661,37 +832,163 @@ class PaymentGUI:
                         # Formato numérico con 2 decimales
                         for row in range(2, ws.max_row + 1):
                             ws[f'{col_letter}{row}'].number_format = '#,##0.00'
-            wb.save(self.manager.excel_path)
-            wb.close()
-            
-            self.log(f"Archivo de montos procesado: {registros_encontrados}/{registros_actualizados} registros encontraron pago semanal")
-            
-            messagebox.showinfo(
-                "Archivo de Montos Procesado",
-                f"Se actualizó el archivo Pagos.xlsx\n\n"
-                f"Registros actualizados: {registros_actualizados}\n"
-                f"Pagos semanales encontrados: {registros_encontrados}"
-            )
-            
+        
+        return registros_encontrados, registros_actualizados
+    
+    def _on_montos_done(self, future):
+        """Informa el resultado de procesar el archivo de montos (hilo de Tk)"""
+        try:
+            result = future.result()
         except Exception as e:
             self.log(f"Error actualizando Excel con montos: {e}")
             import traceback
-            self.log(traceback.format_exc())
+            self.log("".join(traceback.format_exception(type(e), e, e.__traceback__)))
             messagebox.showerror(
                 "Error",
                 f"Error al actualizar el Excel:\n{e}"
             )
+            return
+        
+        if result is None:
+            self.log("Error al cargar archivo de montos")
+            messagebox.showerror(
+                "Error",
+                "No se pudo cargar el archivo de montos.\nRevisa el log para más detalles."
+            )
+            return
+        
+        registros_encontrados, registros_actualizados = result
+        self.log(f"Archivo de montos procesado: {registros_encontrados}/{registros_actualizados} registros encontraron pago semanal")
+        
+        messagebox.showinfo(
+            "Archivo de Montos Procesado",
+            f"Se actualizó el archivo Pagos.xlsx\n\n"
+            f"Registros actualizados: {registros_actualizados}\n"
+            f"Pagos semanales encontrados: {registros_encontrados}"
+        )
+                
+    def _submit(self, callback, func, *args):
+        """Ejecuta func en el pool y entrega el Future a callback en el hilo de Tk"""
+        future = self.pool.submit(func, *args)
+        future.add_done_callback(lambda f: self._post_result(callback, f))
+        return future
+    
+    def _post_result(self, callback, future):
+        """Encola un resultado terminado y despierta a Tk (se llama desde los hilos)"""
+        self.result_q.put((callback, future))
+        self._wake()
+    
+    def _wake(self):
+        """Avisa al loop de Tk que hay resultados en result_q"""
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+    
+    def _start_queue_listener(self):
+        """
+        Registra el pipe de avisos en el loop de Tk para atender result_q sin sondeo.
+        Tk no soporta createfilehandler en Windows; ahí se sondea la cola con after().
+        """
+        if os.name == 'posix' and hasattr(self.root.tk, 'createfilehandler'):
+            r, w = os.pipe()
+            try:
+                os.set_blocking(r, False)
+                self.root.tk.createfilehandler(r, tk.READABLE, self._on_worker_msg)
+            except (RuntimeError, tk.TclError, OSError):
+                os.close(r)
+                os.close(w)
+            else:
+                self._wake_r, self._wake_w = r, w
+                return
+        self.root.after(50, self._poll_queue)
+    
+    def _stop_queue_listener(self):
+        """Desregistra y cierra el pipe de avisos"""
+        if self._wake_r is not None:
+            self.root.tk.deletefilehandler(self._wake_r)
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._wake_r = self._wake_w = None
+    
+    def _on_worker_msg(self, fd, mask):
+        """Callback de Tk cuando el pipe de avisos tiene datos"""
+        try:
+            os.read(fd, 4096)
+        except BlockingIOError:
+            pass
+        try:
+            self._drain_queue()
+        finally:
+            # Si un callback falló, no dejar resultados esperando otro aviso
+            if not self.result_q.empty():
+                self._wake()
+    
+    def _poll_queue(self):
+        """Sondeo periódico de result_q (cuando no hay pipe de avisos)"""
+        try:
+            self._drain_queue()
+        finally:
+            self.root.after(50, self._poll_queue)
+    
+    def _drain_queue(self):
+        """Atiende los trabajos terminados en segundo plano (hilo de Tk)"""
+        while True:
+            try:
+                callback, future = self.result_q.get_nowait()
+            except queue.Empty:
+                break
+            callback(future)
                 
     def log(self, message):
-        """Agrega un mensaje al log"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update()
+        """Agrega un mensaje al log (se muestra en el siguiente ciclo idle)"""
+        self._log_buf.append(message)
+        self._schedule_flush()
+    
+    def _schedule_flush(self):
+        """Programa un único volcado del buffer del log"""
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.root.after_idle(self._flush_log)
+    
+    @staticmethod
+    def _log_tag(message):
+        """Tag de color para una línea del log"""
+        text = message.lstrip(' ->')
+        if text.startswith('Error '):
+            return 'error'
+        if text.startswith(('Advertencia', 'Alertas encontradas')):
+            return 'alert'
+        return ()
+    
+    def _flush_log(self):
+        """Inserta todas las líneas pendientes con un solo insert/see"""
+        self._flush_scheduled = False
+        if not self._log_buf:
+            return
+        # Una sola marca de hora para todos los mensajes de este ciclo
+        prefix = time.strftime("[%H:%M:%S] ")
+        # Pares (texto, tag) para insertar todo con una sola llamada
+        chunks = []
+        for message in self._log_buf:
+            chunks.append(f"{prefix}{message}\n")
+            chunks.append(self._log_tag(message))
+        self._log_buf.clear()
+        self._text_insert(tk.END, *chunks)
+        
+        # Recortar las líneas más antiguas si se excede el máximo (un solo delete)
+        lines = int(self.log_text.index('end-1c').split('.')[0])
+        if lines > self._max_log_lines:
+            keep = self._max_log_lines - self._log_trim_lines
+            self.log_text.delete("1.0", f"{lines - keep + 1}.0")
+        
+        self._text_see(tk.END)
         
     def clear_data(self):
         """Limpia todos los registros del sistema"""
+        if self.manager is None:
+            return
         if not messagebox.askyesno(
             "Confirmar Limpieza",
             "¿Estás seguro de que deseas eliminar TODOS los registros?\n\n"
@@ -704,7 +1001,19 @@ class PaymentGUI:
             return
         
         self.log("Limpiando todos los registros...")
-        success = self.manager.clear_all_data()
+        # clear_all_data espera el io_lock y reintenta si el Excel está abierto: va al pool
+        self._submit(self._on_clear_done, self.manager.clear_all_data)
+    
+    def _on_clear_done(self, future):
+        """Informa el resultado de limpiar los registros (hilo de Tk)"""
+        try:
+            success = future.result()
+        except Exception as e:
+            self.log(f"Error limpiando registros: {e}")
+            success = False
+        # Si la limpieza fue parcial el Excel puede seguir ahí: volver a consultar el disco
+        self._excel_exists_cache = False if success else None
+        self.update_monto_zone_state()
         
         if success:
             self.log("Todos los datos fueron limpiados exitosamente")
@@ -720,6 +1029,8 @@ class PaymentGUI:
             
     def view_excel(self):
         """Abre el archivo Excel en el programa predeterminado"""
+        if self.manager is None:
+            return
         excel_path = self.manager.excel_path
         
         if not os.path.exists(excel_path):
@@ -730,8 +1041,26 @@ class PaymentGUI:
             )
             return
         
+        self._submit(
+            lambda future: self._on_excel_opened(excel_path, future),
+            self._open_path, excel_path
+        )
+    
+    @staticmethod
+    def _open_path(path):
+        """Lanza el programa predeterminado del sistema para path sin esperar a que termine"""
+        if sys.platform == 'win32':
+            subprocess.Popen(['cmd', '/c', 'start', '', path], close_fds=True,
+                             creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            # Sesión propia: el visor no queda atado a la terminal ni al grupo de la app
+            opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+            subprocess.Popen([opener, path], close_fds=True, start_new_session=True)
+    
+    def _on_excel_opened(self, excel_path, future):
+        """Informa el resultado de abrir el Excel (hilo de Tk)"""
         try:
-            os.startfile(excel_path)
+            future.result()
             self.log(f"Abriendo {excel_path}")
         except Exception as e:
             self.log(f"Error al abrir Excel: {e}")
@@ -744,6 +1073,10 @@ class PaymentGUI:
         """Cierra la aplicación"""
         if messagebox.askyesno("Salir", "¿Deseas salir de la aplicación?"):
             self.log("Cerrando aplicación...")
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if self.cpu_pool is not None:
+                self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._stop_queue_listener()
             self.root.quit()
             self.root.destroy()
 
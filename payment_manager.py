@@ -10,7 +10,12 @@ import os
 import sys
 import json
 import logging
+import traceback
 import time
+import threading
+import functools
+import operator
+import copy
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional, Generator
 import unicodedata
@@ -21,25 +26,194 @@ except ImportError:
     print("Error: pandas no está instalado. Ejecuta: pip install pandas")
     sys.exit(1)
 
+# Columnas de texto respaldadas por Arrow si pyarrow está instalado: las operaciones
+# .str corren sobre buffers contiguos en lugar de un objeto str de Python por celda
 try:
-    import openpyxl
+    import pyarrow  # noqa: F401
+    _TEXT_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    _TEXT_DTYPE = str
+
+try:
+    import openpyxl  # noqa: F401  (motor de pandas para los modos append)
     from openpyxl.styles import PatternFill
 except ImportError:
     print("Error: openpyxl no está instalado. Ejecuta: pip install openpyxl")
     sys.exit(1)
 
+# Motores opcionales más rápidos: xlsxwriter para escribir libros completos y calamine
+# (Rust, pandas >= 2.2) para leer. Los modos append siguen usando openpyxl
+try:
+    import xlsxwriter  # noqa: F401
+    _WRITE_ENGINE = 'xlsxwriter'
+except ImportError:
+    _WRITE_ENGINE = 'openpyxl'
+
+try:
+    import python_calamine  # noqa: F401
+    _READ_ENGINE = 'calamine' if tuple(map(int, pd.__version__.split('.')[:2])) >= (2, 2) else 'openpyxl'
+except ImportError:
+    _READ_ENGINE = 'openpyxl'
+
+# orjson (opcional) lee y escribe config.json más rápido, con la misma sangría de 2 espacios
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Encabezado de mensaje de WhatsApp en bytes, para recorrer archivos sin decodificarlos.
+# Acepta espacio normal, NBSP o NNBSP (U+202F, usado por WhatsApp) antes de a.m./p.m.
+_TIMESTAMP_BYTES_RE = re.compile(
+    rb'\[(\d{2}/\d{2}/\d{2}), (\d{1,2}:\d{2}:\d{2})(?:\s|\xc2\xa0|\xe2\x80\xaf)*(?:a\.m\.|p\.m\.)?\]'
+)
+
+# Bloque inicial leído desde el final del archivo al buscar el último encabezado
+_TAIL_BLOCK_SIZE = 8 * 1024
+
+# Patrones del parser, compilados una sola vez (se aplican por cada mensaje del chat)
+
+# Encabezado de mensaje: soporta formato con/sin p.m./a.m. y horas con 1 o 2 dígitos.
+# Anclado a inicio de línea y sin cruzar saltos para recorrer el archivo completo de una vez.
+# Empieza con el literal '[' (sre salta directo a cada '[') y el lookbehind hace de '^':
+# el '[' está al inicio del texto o después de un salto de línea
+_MSG_RE = re.compile(r'\[(?<![^\n]\[)(\d{2}/\d{2}/\d{2}), (\d{1,2}:\d{2}:\d{2})[^\S\n]*(?:a\.m\.|p\.m\.)?\] ([^:\n]+): (.+)')
+
+# Algo que pueda ser un pago: las palabras que marcan grupal/individual o un ID de 6 dígitos
+_PAYMENT_HINT_RE = re.compile(r'grupo|cliente|\d{6}', re.IGNORECASE)
+
+# Inicio de cada grupo dentro de un mensaje y búsqueda del siguiente para delimitarlo
+_GRUPO_POS_RE = re.compile(r'(?:Grupo|Nombre\s+Grupo|GRUPO)\s*:?\s*', re.IGNORECASE)
+_NEXT_GRUPO_RE = re.compile(r'(?:Grupo|Nombre\s+Grupo)\s*:?\s*', re.IGNORECASE)
+_NEXT_GRUPO_MD_RE = re.compile(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*', re.IGNORECASE)
+
+# Nombre de grupo cuando extract_full_name no lo encuentra
+_GRUPO_FALLBACK_RE = re.compile(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?:\s|$|\*|:)', re.IGNORECASE)
+_GRUPO_SINGLE_FALLBACK_RE = re.compile(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:ID|ID\s+Grupo|\d{6}))', re.IGNORECASE)
+
+# Pago (formatos markdown: * **Pago:**, **Pago:**, *Pago; y texto plano)
+_PAGO_MD_RE = re.compile(r'\*\s+\*\*\s*Pago\s*\*?\s*:?\s*\*?\s*\$?\s*([\d,\.]+)|\*\*Pago\*\*\s*:?\s*\$?\s*([\d,\.]+)|\*+\s*\*?\s*Pago\s*:?\s*\*?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+_PAGO_STAR_RE = re.compile(r'\*+\s*\*?\s*Pago\s*:?\s*\*?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+_PAGO_RE = re.compile(r'Pago\s*:?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+
+# Ahorro (markdown con $ explícito, markdown sin $, texto plano)
+_AHORRO_MD_RE = re.compile(r'\*\s+\*\*\s*Ahorro\s*\*?\s*:?\s*\$\s*([\d,\.]+)|\*\*Ahorro\*\*\s*:?\s*\$\s*([\d,\.]+)|\*+\s*\*?\s*Ahorro\s*:?\s*\$\s*([\d,\.]+)', re.IGNORECASE)
+_AHORRO_STAR_RE = re.compile(r'\*+\s*\*?\s*Ahorro\s*:?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+_AHORRO_RE = re.compile(r'Ahorro\s*:?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+
+# Sucursal (termina antes de "Número" o al final del contenido)
+_SUCURSAL_STAR_RE = re.compile(r'\*+\s*\*?\s*Sucursal\s*:?\s*\*?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))', re.IGNORECASE)
+_SUCURSAL_RE = re.compile(r'Sucursal\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))', re.IGNORECASE)
+# Pagos sueltos: sensible a mayúsculas
+_SUCURSAL_CASE_RE = re.compile(r'Sucursal\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))')
+
+# Número de pago ("Número de pago: X", "N pago X", "Pago semana X" y el corto "Pago X")
+_NUM_PAGO_STAR_RE = re.compile(r'\*+\s*\*?\s*(?:Número de pago|N[úu]mero de pago|N pago|N Pago)\s*:?\s*\*?\s*(\d+)', re.IGNORECASE)
+_NUM_PAGO_RE = re.compile(r'(?:Pago\s+semana|Número de pago|N[úu]mero de pago|N pago|N Pago)\s*:?\s*(\d+)', re.IGNORECASE)
+_NUM_PAGO_SHORT_RE = re.compile(r'Pago\s+(\d+)(?:\s|$)', re.IGNORECASE)
+
+# Ciclo (texto plano, **Ciclo**, con asteriscos)
+_CICLO_RE = re.compile(r'Ciclo\s*:?\s*0?(\d+)', re.IGNORECASE)
+_CICLO_BOLD_RE = re.compile(r'\*\*Ciclo\*\*\s*0?(\d+)', re.IGNORECASE)
+_CICLO_STAR_RE = re.compile(r'\*+\s*\*?\s*Ciclo\s*:?\s*0?(\d+)', re.IGNORECASE)
+_CICLO_STAR_SINGLE_RE = re.compile(r'\*+\s*\*?\s*Ciclo\s*\*?\s*:?\s*0?(\d+)', re.IGNORECASE)
+
+# Mensajes del sistema: se ignoran si son exactamente uno de estos, o si empiezan con uno
+# de los prefijos y no traen ningún dato de pago
+_SYSTEM_MESSAGES = frozenset([
+    'Creaste el grupo',
+    'Los mensajes y las llamadas están cifrados de extremo a extremo. Solo las personas en este chat pueden leerlos, escucharlos o compartirlos.',
+    '',
+])
+_SYSTEM_PREFIXES = ('Creaste el grupo', 'Los mensajes y las llamadas están cifrados')
+_SYSTEM_MSG_DATA_RE = re.compile(r'(?:Grupo|Cliente|ID\s*\d|Pago)', re.IGNORECASE)
+
+# Tipo de mensaje: individual con "Cliente", individual "001395 NOMBRE" o grupal
+_CLIENTE_WORD_RE = re.compile(r'\bCliente\b', re.IGNORECASE)
+_IND_SIN_CLIENTE_RE = re.compile(r'^\s*0*(\d{6})\s+([A-ZÁÉÍÓÚÑ\s]+?)(?:\s*\(|$)', re.MULTILINE)
+_GRUPO_WORD_RE = re.compile(r'\bGrupo\b|\bGRUPO\b', re.IGNORECASE)
+
+# Nombre completo entre "Grupo:"/"Nombre Grupo:"/"Cliente:" y "ID" (ver extract_full_name)
+_FULL_NAME_GRUPO_RE = re.compile(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)[:\s]+(.+?)\s+(?:\*+\s*)?\*?\s*ID[:\s]+\d+', re.IGNORECASE | re.DOTALL)
+_FULL_NAME_CLIENTE_RE = re.compile(r'(?:\*+\s*)?\*?\s*Cliente[:\s]+(.+?)\s+(?:\*+\s*)?\*?\s*ID[:\s]+\d+', re.IGNORECASE | re.DOTALL)
+_MD_STARS_RE = re.compile(r'\*+\s*')
+_SPACES_RE = re.compile(r'\s+')
+
+# ID (grupales: * **ID:**, **ID:**, ID Grupo, ID:, ID; pagos sueltos: ID Grupo, ID:, ID)
+_ID_RE = re.compile(r'\*\s+\*\*ID\*\*\s*:?\s*0*(\d{1,6})|\*\s+\*\*ID\s*:?\s*\*+\s*0*(\d{1,6})|\*\*\s*ID\s*\*\*\s*:?\s*0*(\d{1,6})|\*\*ID\*\*\s*:?\s*0*(\d{1,6})|\*+\s*\*?\s*ID\s*:?\s*\*?\s*0*(\d{1,6})|ID\s+(?:Grupo\s+)?0*(\d{1,6})|ID\s*:?\s*0*(\d{1,6})', re.IGNORECASE)
+_ID_SIMPLE_RE = re.compile(r'ID\s+(?:Grupo\s+)?0*(\d{1,6})|ID\s*:?\s*0*(\d{1,6})', re.IGNORECASE)
+
+# Nombre de cliente antes de "ID", concepto entre paréntesis y Total informado
+_CLIENTE_RE = re.compile(r'Cliente\s+([A-Za-zÀ-ÿ\s]+?)(?=\s+ID)', re.IGNORECASE)
+_CONCEPTO_RE = re.compile(r'\(([^)]+)\)')
+_TOTAL_RE = re.compile(r'Total\s*:?\s*\$?\s*([\d,\.]+)', re.IGNORECASE)
+
+# Caracteres que se quitan de un importe antes de convertirlo a float (los espacios se
+# quitan con split, que reconoce los mismos que \s)
+_NUM_STRIP = str.maketrans('', '', '$,')
+
+# Restos de leer números/nulos como texto desde Excel ('123.0', 'nan', 'None')
+_CELL_NOISE_RE = re.compile(r'\.0|nan|None')
+
+
+# Claves de duplicado: la misma entrada en el mismo mensaje (process_file) o en el
+# mismo archivo de confirmaciones (read_confirmations)
+_ENTRY_KEY = operator.itemgetter('ID', 'Grupo', 'Pago', 'Ahorro', 'Fecha', 'Hora')
+_CONFIRMATION_KEY = operator.itemgetter('ID', 'Grupo', 'Pago', 'Ahorro')
+
+
+def _unique_entries(entries: List[Dict], key) -> List[Dict]:
+    """Entradas sin duplicados, conservando la primera de cada clave y el orden"""
+    unique = {}
+    for entry in entries:
+        unique.setdefault(key(entry), entry)
+    return list(unique.values())
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_sucursal(text: str) -> str:
+    """Quita acentos de una sucursal (pocas distintas por archivo, se cachea)"""
+    if not text or text.strip() == '':
+        return "Sin especificar"
+    text = text.strip()
+    # Sin caracteres fuera de ASCII no hay acentos que quitar
+    if text.isascii():
+        return text
+    nfd = unicodedata.normalize('NFD', text)
+    return nfd.encode('ascii', 'ignore').decode('ascii')
+
+
+def synchronized(method):
+    """Serializa las llamadas al método con el lock de I/O de la instancia"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.io_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class PaymentManager:
     """Gestiona el parsing, normalización y almacenamiento de pagos"""
     
+    # Columnas de la hoja Pagos, en el orden en que se guardan
+    PAGOS_COLUMNS = ['Tipo', 'ID', 'Grupo', 'Fecha', 'Hora', 'Pago', 'Ahorro', 'Total', 'Monto Banco',
+                     'Número de Pago', 'Sucursal', 'Corte', 'Ciclo', 'Concepto', 'Depósito', 'Confirmado',
+                     'Pago semanal', 'Pago real', 'Ahorro real']
+    
+    # {ruta: (mtime_ns, config)}: evita volver a parsear config.json si no cambió en disco
+    _config_cache = {}
+    
     def __init__(self, excel_path="Pagos.xlsx"):
         self.excel_path = excel_path
         self.config_path = "config.json"
+        # Serializa el acceso a Pagos.xlsx y config.json desde varios hilos
+        self.io_lock = threading.RLock()
         self.setup_logging()
         self.load_config()
         # Diccionarios para lookup de pago semanal desde archivo de montos
         self.monto_grupos = {}  # {cod_grupo_solidario: valor_AC}
         self.monto_individuales = {}  # {codigo_acreditado: valor_AC}
+        self._monto_table = {}  # {(id_6_digitos, tipo): valor_AC}, ver map_pago_semanal
         
     def load_config(self):
         """Carga configuración desde config.json, si no existe el json, se crea uno por defecto"""
@@ -52,19 +226,41 @@ class PaymentManager:
             },
             "mapeo_id_grupos": {}
         }
+        # {payment_id: (nombre, sucursal)}, se llena en get_group_info_from_config
+        self._group_info_cache = {}
         
-        if os.path.exists(self.config_path):
-            try:
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return
+        
+        cached = self._config_cache.get(self.config_path)
+        if cached is not None and cached[0] == mtime:
+            # Copia para que los cambios de esta instancia no alteren la caché
+            self.config = copy.deepcopy(cached[1])
+            return
+        
+        try:
+            if orjson is not None:
+                with open(self.config_path, 'rb') as f:
+                    self.config = orjson.loads(f.read())
+            else:
                 with open(self.config_path, 'r', encoding='utf-8') as f:
                     self.config = json.load(f)
-            except Exception as e:
-                logging.error(f"Error cargando config: {e}")
+            self._config_cache[self.config_path] = (mtime, copy.deepcopy(self.config))
+        except Exception as e:
+            logging.error(f"Error cargando config: {e}")
     
+    @synchronized
     def save_config(self):
         """Guarda configuración a config.json"""
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                with open(self.config_path, 'wb') as f:
+                    f.write(orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
+            else:
+                with open(self.config_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.config, f, indent=2, ensure_ascii=False)
         except Exception as e:
             logging.error(f"Error guardando config: {e}")
     
@@ -73,10 +269,14 @@ class PaymentManager:
         Obtiene nombre y sucursal normalizados desde config.json
         Retorna: (nombre_normalizado, sucursal)
         """
-        if payment_id in self.config.get("mapeo_id_grupos", {}):
-            grupo_info = self.config["mapeo_id_grupos"][payment_id]
-            return grupo_info.get("nombre"), grupo_info.get("sucursal")
-        return None, None
+        info = self._group_info_cache.get(payment_id)
+        if info is None:
+            info = (None, None)
+            if payment_id in self.config.get("mapeo_id_grupos", {}):
+                grupo_info = self.config["mapeo_id_grupos"][payment_id]
+                info = (grupo_info.get("nombre"), grupo_info.get("sucursal"))
+            self._group_info_cache[payment_id] = info
+        return info
     
     def load_monto_file(self, monto_filepath: str) -> bool:
         """
@@ -90,7 +290,7 @@ class PaymentManager:
                 return False
             
             # Leer Excel
-            df = pd.read_excel(monto_filepath, engine='openpyxl')
+            df = pd.read_excel(monto_filepath, engine=self.READ_ENGINE)
             
             # Limpiar diccionarios anteriores
             self.monto_grupos = {}
@@ -161,12 +361,12 @@ class PaymentManager:
                         logging.warning(f"Error procesando código acreditado en fila {idx}: {e}")
                         continue
             
+            self._build_monto_table()
             logging.info(f"Archivo de montos cargado: {len(self.monto_grupos)} grupos, {len(self.monto_individuales)} individuales")
             return True
             
         except Exception as e:
             logging.error(f"Error cargando archivo de montos: {e}")
-            import traceback
             logging.error(traceback.format_exc())
             return False
         
@@ -197,6 +397,23 @@ class PaymentManager:
         
         return "No encontrado"
     
+    def _build_monto_table(self):
+        """Une los diccionarios de montos en una tabla indexada por (ID, Tipo)"""
+        self._monto_table = {(k, 'Gpo'): str(v) for k, v in self.monto_grupos.items()}
+        for k, v in self.monto_individuales.items():
+            self._monto_table[(k, 'Ind')] = str(v)
+    
+    def map_pago_semanal(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Pago semanal de cada fila de df (columnas ID y Tipo) con un solo lookup vectorizado.
+        Equivale a get_pago_semanal fila por fila
+        """
+        ids = df['ID'].astype(str) if 'ID' in df.columns else pd.Series('', index=df.index)
+        ids = ids.str.zfill(6).str.strip().str.zfill(6)
+        tipos = df['Tipo'].astype(str).str.strip() if 'Tipo' in df.columns else pd.Series('Ind', index=df.index)
+        keys = pd.Series(list(zip(ids, tipos)), index=df.index, dtype=object)
+        return keys.map(self._monto_table).fillna('No encontrado')
+    
     def extract_full_name(self, content: str) -> Optional[str]:
         """
         Extrae el nombre completo del grupo o cliente sin truncar.
@@ -206,26 +423,24 @@ class PaymentManager:
         """
         # Patrón para Grupo o Nombre Grupo (soporta asteriscos opcionales antes)
         # Captura TODO hasta encontrar "ID" seguido de número (puede tener asteriscos antes de ID)
-        grupo_pattern = r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)[:\s]+(.+?)\s+(?:\*+\s*)?\*?\s*ID[:\s]+\d+'
-        grupo_match = re.search(grupo_pattern, content, re.IGNORECASE | re.DOTALL)
+        grupo_match = _FULL_NAME_GRUPO_RE.search(content)
         
         if grupo_match:
             nombre = grupo_match.group(1).strip()
             # Limpiar asteriscos markdown, saltos de línea y espacios múltiples
-            nombre = re.sub(r'\*+\s*', '', nombre)
-            nombre = re.sub(r'\s+', ' ', nombre).strip()
+            nombre = _MD_STARS_RE.sub('', nombre)
+            nombre = _SPACES_RE.sub(' ', nombre).strip()
             if nombre:
                 return nombre.upper()
         
         # Patrón para Cliente (soporta asteriscos opcionales)
-        cliente_pattern = r'(?:\*+\s*)?\*?\s*Cliente[:\s]+(.+?)\s+(?:\*+\s*)?\*?\s*ID[:\s]+\d+'
-        cliente_match = re.search(cliente_pattern, content, re.IGNORECASE | re.DOTALL)
+        cliente_match = _FULL_NAME_CLIENTE_RE.search(content)
         
         if cliente_match:
             nombre = cliente_match.group(1).strip()
             # Limpiar asteriscos markdown, saltos de línea y espacios múltiples
-            nombre = re.sub(r'\*+\s*', '', nombre)
-            nombre = re.sub(r'\s+', ' ', nombre).strip()
+            nombre = _MD_STARS_RE.sub('', nombre)
+            nombre = _SPACES_RE.sub(' ', nombre).strip()
             if nombre:
                 return nombre.upper()
         
@@ -233,23 +448,57 @@ class PaymentManager:
     
     def normalize_sucursal(self, text: str) -> str:
         """Quita acentos de las sucursales"""
-        if not text or text.strip() == '':
-            return "Sin especificar"
-        text = text.strip()
-        nfd = unicodedata.normalize('NFD', text)
-        ascii_text = nfd.encode('ascii', 'ignore').decode('ascii')
-        return ascii_text
+        return _normalize_sucursal(text)
     
     def normalize_number(self, text: str) -> float:
         """Normaliza números quitando $, comas y convirtiendo a float"""
         if not text:
             return 0.0
-        cleaned = re.sub(r'[\$,\s]', '', str(text))
+        cleaned = ''.join(str(text).translate(_NUM_STRIP).split())
         try:
             return float(cleaned)
         except ValueError:
             return 0.0
     
+    # Motor de pd.read_excel (calamine si está instalado)
+    READ_ENGINE = _READ_ENGINE
+    
+    # dtype para leer de Pagos.xlsx las columnas que deben conservar ceros a la izquierda
+    TEXT_DTYPES = {'ID': _TEXT_DTYPE, 'Ciclo': _TEXT_DTYPE, 'Depósito': _TEXT_DTYPE}
+    
+    @staticmethod
+    def normalize_id_series(ids: pd.Series) -> pd.Series:
+        """Limpia una columna de IDs leída como texto y la rellena a 6 dígitos"""
+        ids = ids.fillna('').astype(str)
+        # Leídos con TEXT_DTYPES casi todos son solo dígitos; la limpieza con regex
+        # ('123.0', 'nan') se aplica únicamente al resto
+        dirty = ~ids.str.isdigit()
+        if dirty.any():
+            ids = ids.copy()
+            ids[dirty] = ids[dirty].str.replace(_CELL_NOISE_RE, '', regex=True)
+        return ids.str.zfill(6)
+    
+    @staticmethod
+    def normalize_deposito_series(depositos: pd.Series) -> pd.Series:
+        """
+        Limpia una columna de Depósito leída como texto.
+        Los valores numéricos se rellenan a 9 dígitos (tipo(1) + ID(6) + Ciclo(2)), los vacíos quedan en None
+        """
+        cleaned = depositos.fillna('').astype(str).str.replace(_CELL_NOISE_RE, '', regex=True)
+        stripped = cleaned.str.strip()
+        numeric = stripped.str.replace('.', '', regex=False).str.isdigit()
+        result = stripped.where(~numeric, stripped.str.split('.').str[0].str.zfill(9))
+        return result.astype(object).where(cleaned != '', None)
+    
+    @staticmethod
+    def infer_tipo_series(df: pd.DataFrame) -> pd.Series:
+        """Tipo para filas que no lo traen: 'Gpo' si tienen Ahorro > 0, si no 'Ind'"""
+        tipos = pd.Series('Ind', index=df.index, dtype=object)
+        if 'Ahorro' in df.columns:
+            ahorro = pd.to_numeric(df['Ahorro'], errors='coerce')
+            tipos[ahorro > 0] = 'Gpo'
+        return tipos
+    
     def get_current_corte(self) -> str:
         """
         Determina el corte horario actual basado en la hora del sistema
@@ -258,50 +507,38 @@ class PaymentManager:
         hora_actual = datetime.now().hour
         corte = "Matutino" if hora_actual < 13 else "Vespertino"
         
-        # Guardar en config
-        self.config["horarios"]["corte_actual"] = corte
-        self.save_config()
+        # Guardar en config (solo si cambió: se consulta por cada archivo procesado)
+        if self.config["horarios"].get("corte_actual") != corte:
+            self.config["horarios"]["corte_actual"] = corte
+            self.save_config()
         
         return corte
     
-    def extract_all_payments_from_lines(self, lines: List[str], filename: str, corte: str = None) -> List[Dict]:
-        """Extrae todos los pagos de las líneas del archivo"""
+    def extract_all_payments_from_text(self, text: str, filename: str, corte: str = None) -> List[Dict]:
+        """Extrae todos los pagos del texto completo del archivo (un solo finditer)"""
         entries = []
-        # Soporta formato con/sin p.m./a.m. y horas con 1 o 2 dígitos
-        msg_pattern = r'\[(\d{2}/\d{2}/\d{2}), (\d{1,2}:\d{2}:\d{2})\s*(?:a\.m\.|p\.m\.)?\] ([^:]+): (.+)'
-        
-        i = 0
-        current_fecha = None
-        current_hora = None
+        matches = list(_MSG_RE.finditer(text))
+        ends = [m.start() for m in matches[1:]] + [len(text)]
         
-        while i < len(lines):
-            line = lines[i]
-            match = re.match(msg_pattern, line)
+        for match, end in zip(matches, ends):
+            # Líneas siguientes hasta el siguiente mensaje (saltando el fin de línea del encabezado)
+            following = text[match.end() + 1:end]
+            if following.endswith('\n'):
+                following = following[:-1]
             
-            if match:
-                current_fecha = match.group(1)
-                current_hora = match.group(2)
-                content = match.group(4)
-                
-                # Acumular líneas siguientes hasta el siguiente mensaje
-                following_lines = []
-                j = i + 1
-                while j < len(lines) and not re.match(msg_pattern, lines[j]):
-                    following_lines.append(lines[j].strip())
-                    j += 1
-                
-                # Combinar contenido
-                full_content = content + '\n' + '\n'.join(following_lines)
-                
-                # Extraer grupos de este mensaje
-                extracted = self.extract_payments_from_content(
-                    full_content, current_fecha, current_hora, filename, corte
-                )
-                entries.extend(extracted)
-                
-                i = j
-            else:
-                i += 1
+            # Las líneas se limpian con strip: los campos capturados (p. ej. Sucursal) no deben
+            # arrastrar los espacios de los extremos; la mayoría de los mensajes no tiene más líneas
+            if following:
+                following = '\n'.join(map(str.strip, following.split('\n')))
+            
+            # Combinar contenido
+            full_content = match.group(4) + '\n' + following
+            
+            # Extraer grupos de este mensaje
+            extracted = self.extract_payments_from_content(
+                full_content, match.group(1), match.group(2), filename, corte
+            )
+            entries.extend(extracted)
         
         return entries
     
@@ -309,24 +546,33 @@ class PaymentManager:
         """Extrae uno o más pagos del contenido de un mensaje"""
         entries = []
         
+        # Descarte rápido: sin "Grupo", "Cliente" ni un ID de 6 dígitos no hay pago posible
+        # (la mayoría de los mensajes del chat son conversación)
+        if not _PAYMENT_HINT_RE.search(content):
+            return entries
+        
         # Ignorar mensajes del sistema (solo si el contenido COMPLETO es un mensaje del sistema)
         # No ignorar si contiene información de pago válida
-        if content.strip() in ['Creaste el grupo', 'Los mensajes y las llamadas están cifrados de extremo a extremo. Solo las personas en este chat pueden leerlos, escucharlos o compartirlos.', '']:
+        if content.strip() in _SYSTEM_MESSAGES:
             return entries
         # Ignorar solo si el contenido empieza con estos textos y no tiene datos de pago
-        if (content.startswith('Creaste el grupo') or content.startswith('Los mensajes y las llamadas están cifrados')) and not re.search(r'(?:Grupo|Cliente|ID\s*\d|Pago)', content, re.IGNORECASE):
+        if content.startswith(_SYSTEM_PREFIXES) and not _SYSTEM_MSG_DATA_RE.search(content):
             return entries
         
+        # Copia sin mayúsculas: si la palabra no aparece no hace falta la regex (que además
+        # exige límites de palabra)
+        content_plegado = content.casefold()
+        
         # Detectar tipo: Individual (Cliente o formato ID+NOMBRE) o Grupal (Grupo)
-        es_individual_cliente = bool(re.search(r'\bCliente\b', content, re.IGNORECASE))
+        es_individual_cliente = 'cliente' in content_plegado and bool(_CLIENTE_WORD_RE.search(content))
         
         # Detectar individuales sin "Cliente": formato "001395 ROMANO PALMA EDITH YADIRA"
         # Regex busca ID al inicio o después de timestamp, seguido de nombre en mayúsculas
-        ind_match_sin_cliente = re.search(r'^\s*0*(\d{6})\s+([A-ZÁÉÍÓÚÑ\s]+?)(?:\s*\(|$)', content.strip(), re.MULTILINE)
+        ind_match_sin_cliente = _IND_SIN_CLIENTE_RE.search(content.strip())
         es_individual_sin_cliente = ind_match_sin_cliente is not None
         
         es_individual = es_individual_cliente or es_individual_sin_cliente
-        es_grupal = bool(re.search(r'\bGrupo\b|\bGRUPO\b', content, re.IGNORECASE))
+        es_grupal = 'grupo' in content_plegado and bool(_GRUPO_WORD_RE.search(content))
         
         # Si no hay ni Cliente, ni formato ID+NOMBRE, ni Grupo, no procesar
         if not es_individual and not es_grupal:
@@ -342,8 +588,7 @@ class PaymentManager:
         # Buscar todos los grupos en el contenido (solo para grupales)
         # Usar extract_full_name para capturar nombres completos sin truncar
         # Buscar primero dónde están los grupos para procesarlos individualmente
-        grupo_nombre_pattern = r'(?:Grupo|Nombre\s+Grupo|GRUPO)\s*:?\s*'
-        grupo_positions = list(re.finditer(grupo_nombre_pattern, content, re.IGNORECASE))
+        grupo_positions = list(_GRUPO_POS_RE.finditer(content))
         
         if not grupo_positions:
             # Intentar extraer un solo grupo
@@ -352,14 +597,24 @@ class PaymentManager:
                 entries.append(single_entry)
             return entries
         
+        # Etiquetas opcionales: si el texto no aparece en el mensaje no hace falta
+        # recorrerlo con las expresiones regulares de cada grupo
+        tiene_ahorro = 'ahorro' in content_plegado
+        tiene_sucursal = 'sucursal' in content_plegado
+        
+        # Ciclo y Total se buscan en todo el mensaje, no en el bloque de cada grupo: se buscan
+        # una sola vez (con el primer grupo que llega a necesitarlos) y se reutilizan
+        ciclo_match = total_match = None
+        buscados_en_mensaje = False
+        
         # Para cada posición de grupo encontrada, extraer el nombre completo
         for grupo_pos_match in grupo_positions:
             try:
                 grupo_start = grupo_pos_match.start()
                 # Extraer el contenido desde este grupo hasta el siguiente o fin
-                siguiente_grupo_match = re.search(r'(?:Grupo|Nombre\s+Grupo)\s*:?\s*', content[grupo_start+1:], re.IGNORECASE)
+                siguiente_grupo_match = _NEXT_GRUPO_RE.search(content, grupo_start + 1)
                 if siguiente_grupo_match:
-                    grupo_content = content[grupo_start:siguiente_grupo_match.start()+grupo_start+1]
+                    grupo_content = content[grupo_start:siguiente_grupo_match.start()]
                 else:
                     grupo_content = content[grupo_start:]
                 
@@ -367,7 +622,7 @@ class PaymentManager:
                 grupo = self.extract_full_name(grupo_content)
                 if not grupo:
                     # Fallback al patrón anterior si extract_full_name falla
-                    grupo_match = re.search(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?:\s|$|\*|:)', grupo_content, re.IGNORECASE)
+                    grupo_match = _GRUPO_FALLBACK_RE.search(grupo_content)
                     if grupo_match:
                         grupo = grupo_match.group(1).strip().upper()
                     else:
@@ -375,18 +630,16 @@ class PaymentManager:
                 
                 # Buscar ID después del nombre del grupo (puede estar en línea separada)
                 # Buscar en las siguientes líneas después del grupo, hasta el siguiente grupo o fin de contenido
-                content_after_grupo = content[grupo_start:]
-                # Buscar el siguiente grupo para delimitar la búsqueda
-                siguiente_grupo_match = re.search(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*', content_after_grupo[1:], re.IGNORECASE)
+                siguiente_grupo_match = _NEXT_GRUPO_MD_RE.search(content, grupo_start + 1)
                 if siguiente_grupo_match:
-                    search_window = content_after_grupo[:siguiente_grupo_match.start()+1]
+                    search_window = content[grupo_start:siguiente_grupo_match.start()]
                 else:
-                    search_window = content_after_grupo[:1000]  # Buscar hasta 1000 caracteres
+                    search_window = content[grupo_start:grupo_start + 1000]  # Buscar hasta 1000 caracteres
                 
                 # Buscar ID con varios formatos en la ventana de búsqueda
                 # Soporta: * **ID:**, **ID:**, ID Grupo, ID:, ID
                 # El formato * **ID:** tiene: asterisco, espacio, dos asteriscos, ID, dos puntos, más asteriscos opcionales
-                id_match = re.search(r'\*\s+\*\*ID\*\*\s*:?\s*0*(\d{1,6})|\*\s+\*\*ID\s*:?\s*\*+\s*0*(\d{1,6})|\*\*\s*ID\s*\*\*\s*:?\s*0*(\d{1,6})|\*\*ID\*\*\s*:?\s*0*(\d{1,6})|\*+\s*\*?\s*ID\s*:?\s*\*?\s*0*(\d{1,6})|ID\s+(?:Grupo\s+)?0*(\d{1,6})|ID\s*:?\s*0*(\d{1,6})', search_window, re.IGNORECASE)
+                id_match = _ID_RE.search(search_window)
                 if not id_match:
                     continue
                 
@@ -395,43 +648,48 @@ class PaymentManager:
                 # Extraer datos después del ID encontrado (relativo a la posición del grupo)
                 id_relative_pos = id_match.end()
                 start_pos = grupo_start + id_relative_pos
+                # Las búsquedas de campos parten de start_pos sin copiar la cola del contenido
                 
                 # Buscar Pago (soporta asteriscos markdown: * **Pago:**, **Pago:**, Pago:)
                 # El formato * **Pago:** tiene asteriscos separados por espacio
-                pago_match = re.search(r'\*\s+\*\*\s*Pago\s*\*?\s*:?\s*\*?\s*\$?\s*([\d,\.]+)|\*\*Pago\*\*\s*:?\s*\$?\s*([\d,\.]+)|\*+\s*\*?\s*Pago\s*:?\s*\*?\s*\$?\s*([\d,\.]+)', content[start_pos:], re.IGNORECASE)
+                pago_match = _PAGO_MD_RE.search(content, start_pos)
                 if not pago_match:
                     # Intentar sin asteriscos
-                    pago_match = re.search(r'Pago\s*:?\s*\$?\s*([\d,\.]+)', content[start_pos:], re.IGNORECASE)
+                    pago_match = _PAGO_RE.search(content, start_pos)
                 if not pago_match:
                     continue
                 pago = self.normalize_number(pago_match.group(1) or pago_match.group(2) or pago_match.group(3) or pago_match.group(1))
                 
                 # Buscar Ahorro (soporta asteriscos markdown: * **Ahorro: $X, **Ahorro:**, Ahorro: $X)
                 # El formato * **Ahorro: $X tiene asteriscos separados por espacio
-                ahorro_match = re.search(r'\*\s+\*\*\s*Ahorro\s*\*?\s*:?\s*\$\s*([\d,\.]+)|\*\*Ahorro\*\*\s*:?\s*\$\s*([\d,\.]+)|\*+\s*\*?\s*Ahorro\s*:?\s*\$\s*([\d,\.]+)', content[start_pos:], re.IGNORECASE)
-                if not ahorro_match:
-                    # Intentar con asteriscos pero sin el $ explícito
-                    ahorro_match = re.search(r'\*+\s*\*?\s*Ahorro\s*:?\s*\$?\s*([\d,\.]+)', content[start_pos:], re.IGNORECASE)
-                if not ahorro_match:
-                    # Intentar sin asteriscos
-                    ahorro_match = re.search(r'Ahorro\s*:?\s*\$?\s*([\d,\.]+)', content[start_pos:], re.IGNORECASE)
+                ahorro_match = None
+                if tiene_ahorro:
+                    ahorro_match = _AHORRO_MD_RE.search(content, start_pos)
+                    if not ahorro_match:
+                        # Intentar con asteriscos pero sin el $ explícito
+                        ahorro_match = _AHORRO_STAR_RE.search(content, start_pos)
+                    if not ahorro_match:
+                        # Intentar sin asteriscos
+                        ahorro_match = _AHORRO_RE.search(content, start_pos)
                 ahorro = self.normalize_number(ahorro_match.group(1) or ahorro_match.group(2) or ahorro_match.group(3) or ahorro_match.group(1)) if ahorro_match else 0.0
                 
                 # Buscar Sucursal (soporta asteriscos markdown)
-                sucursal_match = re.search(r'\*+\s*\*?\s*Sucursal\s*:?\s*\*?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))', content[start_pos:], re.IGNORECASE)
-                if not sucursal_match:
-                    # Intentar sin asteriscos
-                    sucursal_match = re.search(r'Sucursal\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))', content[start_pos:], re.IGNORECASE)
+                sucursal_match = None
+                if tiene_sucursal:
+                    sucursal_match = _SUCURSAL_STAR_RE.search(content, start_pos)
+                    if not sucursal_match:
+                        # Intentar sin asteriscos
+                        sucursal_match = _SUCURSAL_RE.search(content, start_pos)
                 sucursal = sucursal_match.group(1).strip() if sucursal_match else None
                 
                 # Buscar Número de pago (soporta "Pago semana X" y "Número de pago: X" con asteriscos)
-                num_match = re.search(r'\*+\s*\*?\s*(?:Número de pago|N[úu]mero de pago|N pago|N Pago)\s*:?\s*\*?\s*(\d+)', content[start_pos:], re.IGNORECASE)
+                num_match = _NUM_PAGO_STAR_RE.search(content, start_pos)
                 if not num_match:
                     # Intentar sin asteriscos
-                    num_match = re.search(r'(?:Pago\s+semana|Número de pago|N[úu]mero de pago|N pago|N Pago)\s*:?\s*(\d+)', content[start_pos:], re.IGNORECASE)
+                    num_match = _NUM_PAGO_RE.search(content, start_pos)
                 if not num_match:
                     # Intentar formato corto "Pago X"
-                    num_match = re.search(r'Pago\s+(\d+)(?:\s|$)', content[start_pos:], re.IGNORECASE)
+                    num_match = _NUM_PAGO_SHORT_RE.search(content, start_pos)
                 num_pago = int(num_match.group(1)) if num_match else None
                 # Si no hay número de pago, usar "Pendiente"
                 if num_pago is None:
@@ -439,18 +697,21 @@ class PaymentManager:
                 
                 # Buscar Ciclo (OBLIGATORIO, solo acepta 1 o 2) - soporta asteriscos markdown
                 # Buscar primero en todo el content (puede estar fuera del bloque del grupo)
-                ciclo_match = re.search(r'Ciclo\s*:?\s*0?(\d+)', content, re.IGNORECASE)
-                if not ciclo_match:
-                    ciclo_match = re.search(r'\*\*Ciclo\*\*\s*0?(\d+)', content, re.IGNORECASE)
-                if not ciclo_match:
-                    ciclo_match = re.search(r'\*+\s*\*?\s*Ciclo\s*:?\s*0?(\d+)', content, re.IGNORECASE)
+                if not buscados_en_mensaje:
+                    ciclo_match = _CICLO_RE.search(content)
+                    if not ciclo_match:
+                        ciclo_match = _CICLO_BOLD_RE.search(content)
+                    if not ciclo_match:
+                        ciclo_match = _CICLO_STAR_RE.search(content)
+                    total_match = _TOTAL_RE.search(content)
+                    buscados_en_mensaje = True
                 if not ciclo_match:
-                    logging.warning(f"Ciclo no encontrado para ID {payment_id}")
+                    logging.warning("Ciclo no encontrado para ID %s", payment_id)
                     continue
                 
                 ciclo_num = int(ciclo_match.group(1))
                 if ciclo_num not in [1, 2]:
-                    logging.warning(f"Ciclo inválido {ciclo_num} para ID {payment_id}")
+                    logging.warning("Ciclo inválido %s para ID %s", ciclo_num, payment_id)
                     continue
                 
                 ciclo_formato = f"{ciclo_num:02d}"
@@ -472,15 +733,13 @@ class PaymentManager:
                 # Calcular Total
                 total_calculado = round(pago + ahorro, 2)
                 
-                # Buscar Total en el contenido para validación
-                total_match = re.search(r'Total\s*:?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+                # Validar contra el Total del contenido, si lo hay
                 if total_match:
                     total_dado = self.normalize_number(total_match.group(1))
                     # Validar que Total = Pago + Ahorro (tolerancia 0.01)
                     if abs(total_dado - total_calculado) > 0.01:
-                        logging.warning(f"Discrepancia en Total para ID {payment_id}: "
-                                      f"Calculado={total_calculado}, Dado={total_dado}, "
-                                      f"Diferencia={abs(total_dado - total_calculado)}")
+                        logging.warning("Discrepancia en Total para ID %s: Calculado=%s, Dado=%s, Diferencia=%s",
+                                        payment_id, total_calculado, total_dado, abs(total_dado - total_calculado))
                 
                 entry = {
                     'Tipo': 'Gpo',  # Es grupal
@@ -504,7 +763,7 @@ class PaymentManager:
                 
                 entries.append(entry)
             except Exception as e:
-                logging.error(f"Error parseando entrada: {e}")
+                logging.error("Error parseando entrada: %s", e)
                 continue
         
         return entries
@@ -512,14 +771,16 @@ class PaymentManager:
     def extract_single_payment(self, content: str, fecha: str, hora: str, filename: str, corte: str = None) -> Optional[Dict]:
         """Extrae un solo pago del contenido (Individual o Grupal)"""
         # Detectar tipo: Individual (Cliente o formato ID+NOMBRE) o Grupal (Grupo)
-        es_individual_cliente = bool(re.search(r'\bCliente\b', content, re.IGNORECASE))
+        # (la regex solo corre si la palabra aparece en la copia sin mayúsculas)
+        content_plegado = content.casefold()
+        es_individual_cliente = 'cliente' in content_plegado and bool(_CLIENTE_WORD_RE.search(content))
         
         # Detectar individuales sin "Cliente": formato "001395 ROMANO PALMA EDITH YADIRA"
-        ind_match_sin_cliente = re.search(r'^\s*0*(\d{6})\s+([A-ZÁÉÍÓÚÑ\s]+?)(?:\s*\(|$)', content.strip(), re.MULTILINE)
+        ind_match_sin_cliente = _IND_SIN_CLIENTE_RE.search(content.strip())
         es_individual_sin_cliente = ind_match_sin_cliente is not None
         
         es_individual = es_individual_cliente or es_individual_sin_cliente
-        es_grupal = bool(re.search(r'\bGrupo\b|\bGRUPO\b', content, re.IGNORECASE))
+        es_grupal = 'grupo' in content_plegado and bool(_GRUPO_WORD_RE.search(content))
         
         if not es_individual and not es_grupal:
             return None
@@ -535,50 +796,50 @@ class PaymentManager:
             nombre_ind_sin_cliente = ind_match_sin_cliente.group(2).strip().upper()
             
             # Extraer Concepto si hay paréntesis
-            concepto_match = re.search(r'\(([^)]+)\)', content)
+            concepto_match = _CONCEPTO_RE.search(content)
             if concepto_match:
                 concepto_ind_sin_cliente = concepto_match.group(1).strip()
             
         # Si no se encontró con formato nuevo, buscar formato tradicional (soporta "ID Grupo" y "ID:")
         if not payment_id:
-            id_match = re.search(r'ID\s+(?:Grupo\s+)?0*(\d{1,6})|ID\s*:?\s*0*(\d{1,6})', content, re.IGNORECASE)
+            id_match = _ID_SIMPLE_RE.search(content)
             if not id_match:
                 return None
             payment_id = (id_match.group(1) or id_match.group(2)).zfill(6)
         
         # Buscar Pago (OPCIONAL para individuales sin Cliente, requerido para otros, soporta asteriscos)
-        pago_match = re.search(r'\*+\s*\*?\s*Pago\s*:?\s*\*?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+        pago_match = _PAGO_STAR_RE.search(content)
         if not pago_match:
-            pago_match = re.search(r'Pago\s*:?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+            pago_match = _PAGO_RE.search(content)
         if pago_match:
             pago = self.normalize_number(pago_match.group(1))
         else:
             # Pago no encontrado - solo permitido para individuales sin Cliente
             if es_individual_sin_cliente:
                 pago = 0.0
-                logging.info(f"ID {payment_id}: Pago no encontrado → 0.0 (pendiente de imagen)")
+                logging.info("ID %s: Pago no encontrado → 0.0 (pendiente de imagen)", payment_id)
             else:
                 return None  # Para otros formatos, Pago es obligatorio
         
         # Buscar Sucursal
-        sucursal_match = re.search(r'Sucursal\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:N[úu]mero|$))', content)
+        sucursal_match = _SUCURSAL_CASE_RE.search(content)
         sucursal = sucursal_match.group(1).strip() if sucursal_match else None
         # Default inteligente: si no hay sucursal, usar "Pendiente"
         if not sucursal:
             sucursal = "Pendiente"
         
         # Buscar Ciclo (OBLIGATORIO, solo acepta 1 o 2, default "01" si falta, soporta asteriscos)
-        ciclo_match = re.search(r'\*+\s*\*?\s*Ciclo\s*\*?\s*:?\s*0?(\d+)', content, re.IGNORECASE)
+        ciclo_match = _CICLO_STAR_SINGLE_RE.search(content)
         if not ciclo_match:
-            ciclo_match = re.search(r'Ciclo\s*:?\s*0?(\d+)', content, re.IGNORECASE)
+            ciclo_match = _CICLO_RE.search(content)
         if not ciclo_match:
             # Default: usar "01" si no se encuentra (solo para individuales sin Cliente)
             if es_individual_sin_cliente:
                 ciclo_num = 1
                 ciclo_formato = "01"
-                logging.info(f"ID {payment_id}: Ciclo no encontrado → usando default '01'")
+                logging.info("ID %s: Ciclo no encontrado → usando default '01'", payment_id)
             else:
-                logging.warning(f"Ciclo inválido o faltante para ID {payment_id}: No encontrado")
+                logging.warning("Ciclo inválido o faltante para ID %s: No encontrado", payment_id)
                 return None
         else:
             ciclo_num = int(ciclo_match.group(1))
@@ -587,9 +848,9 @@ class PaymentManager:
                 if es_individual_sin_cliente:
                     ciclo_num = 1
                     ciclo_formato = "01"
-                    logging.warning(f"ID {payment_id}: Ciclo inválido {ciclo_match.group(1)} → usando default '01'")
+                    logging.warning("ID %s: Ciclo inválido %s → usando default '01'", payment_id, ciclo_match.group(1))
                 else:
-                    logging.warning(f"Ciclo inválido o faltante para ID {payment_id}: {ciclo_num}")
+                    logging.warning("Ciclo inválido o faltante para ID %s: %s", payment_id, ciclo_num)
                     return None
             else:
                 ciclo_formato = f"{ciclo_num:02d}"  # "01" o "02"
@@ -621,7 +882,7 @@ class PaymentManager:
                 cliente_nombre = self.extract_full_name(content)
                 if not cliente_nombre:
                     # Fallback al patrón anterior si extract_full_name falla
-                    cliente_match = re.search(r'Cliente\s+([A-Za-zÀ-ÿ\s]+?)(?=\s+ID)', content, re.IGNORECASE)
+                    cliente_match = _CLIENTE_RE.search(content)
                     if not cliente_match:
                         return None
                     cliente_nombre = cliente_match.group(1).strip().upper()
@@ -640,22 +901,22 @@ class PaymentManager:
             grupo = self.extract_full_name(content)
             if not grupo:
                 # Fallback al patrón anterior si extract_full_name falla
-                grupo_match = re.search(r'(?:\*+\s*)?\*?\s*(?:Nombre\s+)?(?:Grupo|GRUPO)\s*:?\s*([A-Za-zÀ-ÿ\s]+?)(?=\s*(?:ID|ID\s+Grupo|\d{6}))', content, re.IGNORECASE)
+                grupo_match = _GRUPO_SINGLE_FALLBACK_RE.search(content)
                 if not grupo_match:
                     return None
                 grupo = grupo_match.group(1).strip().upper()
             
             # Buscar Ahorro (solo para grupales, soporta asteriscos markdown)
-            ahorro_match = re.search(r'\*+\s*\*?\s*Ahorro\s*:?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+            ahorro_match = _AHORRO_STAR_RE.search(content)
             if not ahorro_match:
-                ahorro_match = re.search(r'Ahorro\s*:?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+                ahorro_match = _AHORRO_RE.search(content)
             ahorro = self.normalize_number(ahorro_match.group(1)) if ahorro_match else 0.0
             
             # Buscar Número de pago (solo para grupales, soporta "Pago semana X")
-            num_match = re.search(r'(?:Pago\s+semana|Número de pago|N[úu]mero de pago|N pago|N Pago)\s*:?\s*(\d+)', content, re.IGNORECASE)
+            num_match = _NUM_PAGO_RE.search(content)
             if not num_match:
                 # Intentar formato corto "Pago X"
-                num_match = re.search(r'Pago\s+(\d+)(?:\s|$)', content, re.IGNORECASE)
+                num_match = _NUM_PAGO_SHORT_RE.search(content)
             num_pago = int(num_match.group(1)) if num_match else None
             # Si no hay número de pago y es grupal, usar "Pendiente"
             if es_grupal and num_pago is None:
@@ -672,14 +933,13 @@ class PaymentManager:
         
         # Buscar Total en el contenido para validación (solo grupal puede tenerlo)
         if es_grupal:
-            total_match = re.search(r'Total\s*:?\s*\$?\s*([\d,\.]+)', content, re.IGNORECASE)
+            total_match = _TOTAL_RE.search(content)
             if total_match:
                 total_dado = self.normalize_number(total_match.group(1))
                 # Validar que Total = Pago + Ahorro (tolerancia 0.01)
                 if abs(total_dado - total_calculado) > 0.01:
-                    logging.warning(f"Discrepancia en Total para ID {payment_id}: "
-                                  f"Calculado={total_calculado}, Dado={total_dado}, "
-                                  f"Diferencia={abs(total_dado - total_calculado)}")
+                    logging.warning("Discrepancia en Total para ID %s: Calculado=%s, Dado=%s, Diferencia=%s",
+                                    payment_id, total_calculado, total_dado, abs(total_dado - total_calculado))
         
         return {
             'Tipo': tipo,
@@ -701,13 +961,14 @@ class PaymentManager:
             'Archivo': filename
         }
     
+    @synchronized
     def get_last_timestamp(self) -> Optional[str]:
         """Obtiene el último timestamp procesado desde la hoja Meta"""
         try:
             if not os.path.exists(self.excel_path):
                 return None
             
-            df_meta = pd.read_excel(self.excel_path, sheet_name='Meta', engine='openpyxl')
+            df_meta = pd.read_excel(self.excel_path, sheet_name='Meta', engine=self.READ_ENGINE)
             if df_meta.empty or 'ultimo_timestamp' not in df_meta.columns:
                 return None
             
@@ -716,50 +977,63 @@ class PaymentManager:
             logging.error(f"Error leyendo último timestamp: {e}")
             return None
     
-    def save_timestamp(self, timestamp: str):
-        """Guarda el último timestamp procesado en la hoja Meta"""
-        try:
-            wb = openpyxl.load_workbook(self.excel_path) if os.path.exists(self.excel_path) else openpyxl.Workbook()
-            
-            # Eliminar hoja Meta si existe
-            if 'Meta' in wb.sheetnames:
-                wb.remove(wb['Meta'])
-            
-            ws_meta = wb.create_sheet('Meta', 0)
-            ws_meta.append(['ultimo_timestamp'])
-            ws_meta.append([timestamp])
-            ws_meta.sheet_state = 'hidden'
-            
-            wb.save(self.excel_path)
-            wb.close()
-        except Exception as e:
-            logging.error(f"Error guardando timestamp: {e}")
-    
     def extract_last_timestamp_from_file(self, filepath: str) -> Optional[str]:
         """Extrae el timestamp del último mensaje en el archivo"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            last = None
+            with open(filepath, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                # El último mensaje está al final: se lee un bloque desde el final y se
+                # agranda solo si no contiene ningún encabezado completo (los encabezados
+                # no se solapan, así que el último del bloque es el último del archivo)
+                block = _TAIL_BLOCK_SIZE
+                while True:
+                    start = max(0, size - block)
+                    f.seek(start)
+                    for match in _TIMESTAMP_BYTES_RE.finditer(f.read(size - start)):
+                        last = match.groups()
+                    if last is not None or start == 0:
+                        break
+                    block *= 4
+            if last is None:
+                return None
             
-            # Soporta formato con/sin p.m./a.m. y horas con 1 o 2 dígitos
-            msg_pattern = r'\[(\d{2}/\d{2}/\d{2}), (\d{1,2}:\d{2}:\d{2})\s*(?:a\.m\.|p\.m\.)?\]'
-            for line in reversed(lines):
-                match = re.search(msg_pattern, line)
-                if match:
-                    fecha = match.group(1)
-                    hora = match.group(2)
-                    # Limpiar "p.m./a.m." si estaba presente en la captura
-                    hora = hora.split()[0] if ' ' in hora else hora
-                    dd, mm, yy = fecha.split('/')
-                    timestamp = f"{yy}/{mm}/{dd} {hora}"
-                    return timestamp
-            return None
+            fecha, hora = (g.decode('ascii') for g in last)
+            dd, mm, yy = fecha.split('/')
+            timestamp = f"{yy}/{mm}/{dd} {hora}"
+            return timestamp
         except Exception as e:
             logging.error(f"Error extrayendo timestamp de {filepath}: {e}")
             return None
     
-    def process_file(self, filepath: str) -> Tuple[List[Dict], int, int]:
-        """Procesa un archivo .txt y extrae pagos"""
+    def parse_file(self, filepath: str, corte: str = None) -> List[Dict]:
+        """Lee un archivo .txt y extrae sus pagos sin tocar Excel ni config.json"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            text = f.read()
+        
+        filename = os.path.basename(filepath)
+        return self.extract_all_payments_from_text(text, filename, corte)
+    
+    @classmethod
+    def parse_only(cls, filepath: str, corte: str, config: Dict,
+                   monto_grupos: Dict, monto_individuales: Dict) -> List[Dict]:
+        """
+        Versión de parse_file apta para ProcessPoolExecutor.
+        Recibe el estado necesario para el parsing en lugar de leerlo de disco.
+        No configura el log a archivo: log.txt lo escribe solo el proceso principal.
+        """
+        manager = cls.__new__(cls)
+        manager.config = config
+        manager._group_info_cache = {}
+        manager.monto_grupos = monto_grupos
+        manager.monto_individuales = monto_individuales
+        return manager.parse_file(filepath, corte)
+    
+    def process_file(self, filepath: str, executor=None) -> Tuple[List[Dict], int, int]:
+        """
+        Procesa un archivo .txt y extrae pagos.
+        Si se indica executor (ProcessPoolExecutor), el parsing se hace en otro proceso.
+        """
         entries = []
         errors = 0
         duplicates = 0
@@ -776,36 +1050,26 @@ class PaymentManager:
         corte_actual = self.get_current_corte()
         
         try:
-            # Usar generador línea por línea en lugar de readlines
-            lines = []
-            with open(filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    lines.append(line.rstrip('\n\r'))
-            
-            filename = os.path.basename(filepath)
-            entries = self.extract_all_payments_from_lines(lines, filename, corte_actual)
+            if executor is not None:
+                entries = executor.submit(
+                    PaymentManager.parse_only, filepath, corte_actual, self.config,
+                    self.monto_grupos, self.monto_individuales
+                ).result()
+            else:
+                entries = self.parse_file(filepath, corte_actual)
             
             # Eliminar duplicados usando ID + Grupo + Pago + Ahorro + timestamp
-            seen = set()
-            unique_entries = []
-            for entry in entries:
-                key = f"{entry['ID']}_{entry['Grupo']}_{entry['Pago']}_{entry['Ahorro']}_{entry['Fecha']} {entry['Hora']}"
-                if key not in seen:
-                    seen.add(key)
-                    unique_entries.append(entry)
-                else:
-                    duplicates += 1
-            
+            unique_entries = _unique_entries(entries, _ENTRY_KEY)
+            duplicates += len(entries) - len(unique_entries)
             entries = unique_entries
             
-            # Guardar timestamp si se procesó exitosamente
             if entries and last_ts:
-                self.save_timestamp(last_ts)
                 logging.info(f"Procesados {len(entries)} pagos de {filepath}")
                 
-                # Guardar corte de procesamiento en config
-                self.config["horarios"]["archivo_procesado"] = corte_actual
-                self.save_config()
+                # Guardar corte de procesamiento en config (solo si cambió)
+                if self.config["horarios"].get("archivo_procesado") != corte_actual:
+                    self.config["horarios"]["archivo_procesado"] = corte_actual
+                    self.save_config()
             
         except Exception as e:
             logging.error(f"Error procesando {filepath}: {e}")
@@ -813,6 +1077,139 @@ class PaymentManager:
         
         return entries, errors, duplicates
     
+    def _format_pagos_sheet(self, ws):
+        """Formato de la hoja Pagos: ID/Ciclo/Depósito como texto, importes con 2 decimales
+        y Pago real en verde/rojo según cubra el Pago semanal"""
+        for cell in ws[1]:  # Primera fila (encabezados)
+            if cell.value == 'ID':
+                col_letter = cell.column_letter
+                # Formatear todas las celdas de la columna ID como texto
+                for row in range(2, ws.max_row + 1):
+                    ws[f'{col_letter}{row}'].number_format = '@'  # @ = texto
+            elif cell.value == 'Ciclo':
+                col_letter = cell.column_letter
+                # Formatear todas las celdas de la columna Ciclo como texto
+                for row in range(2, ws.max_row + 1):
+                    ws[f'{col_letter}{row}'].number_format = '@'  # @ = texto
+            elif cell.value == 'Depósito':
+                col_letter = cell.column_letter
+                # Formatear todas las celdas de la columna Depósito como texto
+                for row in range(2, ws.max_row + 1):
+                    cell_ref = ws[f'{col_letter}{row}']
+                    cell_ref.number_format = '@'  # @ = texto
+                    # Asegurar que el valor se guarde como string (preserva ceros a la izquierda)
+                    if cell_ref.value is not None:
+                        # Convertir a string, preservando formato completo con ceros
+                        dep_value = str(cell_ref.value)
+                        # Si el valor es numérico y empieza con 0, preservarlo
+                        if dep_value.isdigit() and len(dep_value) == 9:
+                            # Ya tiene formato correcto (9 dígitos: tipo(1) + ID(6) + Ciclo(2))
+                            cell_ref.value = dep_value
+                        else:
+                            # Normalizar a string asegurando formato completo
+                            cell_ref.value = str(cell_ref.value).zfill(9) if len(str(cell_ref.value)) < 9 else str(cell_ref.value)
+
+            # Formatear columnas numéricas: Monto Banco, Pago real, Ahorro real
+            elif cell.value == 'Monto Banco':
+                col_letter = cell.column_letter
+                # Formato numérico con 2 decimales
+                for row in range(2, ws.max_row + 1):
+                    ws[f'{col_letter}{row}'].number_format = '#,##0.00'
+
+            elif cell.value == 'Pago real':
+                col_letter = cell.column_letter
+
+                # Color verde para suficiente pago, rojo para insuficiente
+                fill_verde = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+                fill_rojo = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+
+                # Obtener índices de columnas para comparación
+                monto_banco_col = None
+                pago_semanal_col = None
+                for header_cell in ws[1]:
+                    if header_cell.value == 'Monto Banco':
+                        monto_banco_col = header_cell.column
+                    elif header_cell.value == 'Pago semanal':
+                        pago_semanal_col = header_cell.column
+
+                # Aplicar formato y color a cada celda
+                for row in range(2, ws.max_row + 1):
+                    cell_ref = ws[f'{col_letter}{row}']
+                    cell_ref.number_format = '#,##0.00'
+
+                    # Solo aplicar color si la celda tiene valor
+                    if cell_ref.value is not None:
+                        try:
+                            pago_real_val = float(cell_ref.value)
+
+                            # Obtener valores de Monto Banco y Pago semanal para comparar
+                            if monto_banco_col and pago_semanal_col:
+                                monto_banco_cell = ws.cell(row=row, column=monto_banco_col)
+                                pago_semanal_cell = ws.cell(row=row, column=pago_semanal_col)
+
+                                if monto_banco_cell.value is not None and pago_semanal_cell.value is not None:
+                                    try:
+                                        monto_banco_val = float(monto_banco_cell.value)
+                                        pago_semanal_val = float(pago_semanal_cell.value)
+
+                                        # Comparar y aplicar color
+                                        if monto_banco_val >= pago_semanal_val:
+                                            cell_ref.fill = fill_verde
+                                        else:
+                                            cell_ref.fill = fill_rojo
+                                    except (ValueError, TypeError):
+                                        pass
+                        except (ValueError, TypeError):
+                            pass
+
+            elif cell.value == 'Ahorro real':
+                col_letter = cell.column_letter
+                # Formato numérico con 2 decimales
+                for row in range(2, ws.max_row + 1):
+                    ws[f'{col_letter}{row}'].number_format = '#,##0.00'
+    
+    @staticmethod
+    def _format_pagos_xlsxwriter(writer, df: pd.DataFrame):
+        """Mismo formato que _format_pagos_sheet para un libro escrito con xlsxwriter
+        (formato por columna; las celdas de Pago real se reescriben con su color)"""
+        book = writer.book
+        ws = writer.sheets['Pagos']
+        texto = book.add_format({'num_format': '@'})
+        numero = book.add_format({'num_format': '#,##0.00'})
+        verde = book.add_format({'num_format': '#,##0.00', 'pattern': 1, 'bg_color': '#C6EFCE'})
+        rojo = book.add_format({'num_format': '#,##0.00', 'pattern': 1, 'bg_color': '#FFC7CE'})
+        
+        columns = list(df.columns)
+        for col, fmt in (('ID', texto), ('Ciclo', texto), ('Depósito', texto),
+                         ('Monto Banco', numero), ('Pago real', numero), ('Ahorro real', numero)):
+            if col in columns:
+                idx = columns.index(col)
+                ws.set_column(idx, idx, None, fmt)
+        
+        if not all(col in columns for col in ('Pago real', 'Monto Banco', 'Pago semanal')):
+            return
+        
+        def as_float(value):
+            if value is None or (isinstance(value, float) and pd.isna(value)):
+                return None
+            try:
+                return float(value)
+            except (ValueError, TypeError):
+                return None
+        
+        # Color verde para suficiente pago, rojo para insuficiente
+        pago_real_idx = columns.index('Pago real')
+        rows = zip(df['Pago real'], df['Monto Banco'], df['Pago semanal'])
+        for row, (pago_real, monto_banco, pago_semanal) in enumerate(rows, start=1):
+            pago_real_val = as_float(pago_real)
+            monto_banco_val = as_float(monto_banco)
+            pago_semanal_val = as_float(pago_semanal)
+            if pago_real_val is None or monto_banco_val is None or pago_semanal_val is None:
+                continue
+            ws.write_number(row, pago_real_idx, pago_real_val,
+                            verde if monto_banco_val >= pago_semanal_val else rojo)
+    
+    @synchronized
     def add_to_excel(self, entries: List[Dict]) -> int:
         """Agrega entradas al Excel"""
         if not entries:
@@ -824,8 +1221,7 @@ class PaymentManager:
             df_new = pd.DataFrame(entries)
             
             # Orden EXACTO de columnas con 'Tipo' como primera columna, 'Concepto' después de 'Ciclo', 'Depósito' antes de 'Confirmado', 'Pago semanal' al final
-            cols_orden = ['Tipo', 'ID', 'Grupo', 'Fecha', 'Hora', 'Pago', 'Ahorro', 'Total', 'Monto Banco',
-                         'Número de Pago', 'Sucursal', 'Corte', 'Ciclo', 'Concepto', 'Depósito', 'Confirmado', 'Pago semanal', 'Pago real', 'Ahorro real']
+            cols_orden = self.PAGOS_COLUMNS
             
             # Eliminar 'Archivo' que no debe ir al Excel
             if 'Archivo' in df_new.columns:
@@ -867,22 +1263,12 @@ class PaymentManager:
             # Procesar columna 'Pago semanal' para nuevos registros
             if 'Pago semanal' not in df_new.columns:
                 # Agregar columna aplicando lookup si hay diccionarios cargados
-                df_new['Pago semanal'] = df_new.apply(
-                    lambda row: self.get_pago_semanal(
-                        str(row.get('ID', '')).zfill(6),
-                        str(row.get('Tipo', 'Ind')).strip()
-                    ), axis=1
-                )
+                df_new['Pago semanal'] = self.map_pago_semanal(df_new)
             else:
                 # Si existe pero tiene valores vacíos, rellenar con lookup
                 mask = (df_new['Pago semanal'].isna()) | (df_new['Pago semanal'] == '') | (df_new['Pago semanal'] == 'No encontrado')
                 if mask.any():
-                    df_new.loc[mask, 'Pago semanal'] = df_new.loc[mask].apply(
-                        lambda row: self.get_pago_semanal(
-                            str(row.get('ID', '')).zfill(6),
-                            str(row.get('Tipo', 'Ind')).strip()
-                        ), axis=1
-                    )
+                    df_new.loc[mask, 'Pago semanal'] = self.map_pago_semanal(df_new.loc[mask])
             
             # Calcular columna 'Depósito' para entradas nuevas si no existe
             if 'Depósito' not in df_new.columns:
@@ -946,10 +1332,7 @@ class PaymentManager:
                 if col not in df_new.columns:
                     if col == 'Tipo':
                         # Si no hay Tipo, inferir de otros campos
-                        df_new[col] = df_new.apply(
-                            lambda row: 'Gpo' if pd.notna(row.get('Ahorro', 0)) and float(row.get('Ahorro', 0)) > 0 
-                                       else 'Ind', axis=1
-                        )
+                        df_new[col] = self.infer_tipo_series(df_new)
                     elif col == 'Ciclo':
                         # Ciclo es obligatorio, no debería faltar pero por seguridad
                         logging.warning("Columna Ciclo faltante en datos - esto no debería pasar")
@@ -959,12 +1342,7 @@ class PaymentManager:
                         df_new[col] = 'Pendiente de imagen'
                     elif col == 'Pago semanal':
                         # Calcular Pago semanal si falta
-                        df_new[col] = df_new.apply(
-                            lambda row: self.get_pago_semanal(
-                                str(row.get('ID', '')).zfill(6),
-                                str(row.get('Tipo', 'Ind')).strip()
-                            ), axis=1
-                        )
+                        df_new[col] = self.map_pago_semanal(df_new)
                     elif col == 'Depósito':
                         # Calcular Depósito si falta
                         df_new[col] = df_new.apply(
@@ -992,41 +1370,23 @@ class PaymentManager:
                     df_existing = pd.read_excel(
                         self.excel_path, 
                         sheet_name='Pagos', 
-                        engine='openpyxl',
-                        dtype={'ID': str, 'Ciclo': str, 'Depósito': str}
+                        engine=self.READ_ENGINE,
+                        dtype=self.TEXT_DTYPES
                     )
                     
                     # Normalizar ID (ya es string por dtype, solo limpiar y formatear)
                     if 'ID' in df_existing.columns:
-                        df_existing['ID'] = df_existing['ID'].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '').str.replace('None', '')
-                        df_existing['ID'] = df_existing['ID'].str.zfill(6)
+                        df_existing['ID'] = self.normalize_id_series(df_existing['ID'])
                     
                     # Normalizar Depósito (ya es string por dtype, solo asegurar formato completo)
                     if 'Depósito' in df_existing.columns:
-                        df_existing['Depósito'] = df_existing['Depósito'].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '').str.replace('None', '')
                         # Asegurar formato completo de 9 dígitos (tipo(1) + ID(6) + Ciclo(2))
-                        def fix_deposito_format(val):
-                            if pd.isna(val) or val == '' or val == 'nan' or val == 'None':
-                                return None
-                            val_str = str(val).strip()
-                            # Si es numérico y tiene menos de 9 dígitos, rellenar con ceros
-                            if val_str.replace('.', '').isdigit():
-                                # Quitar punto decimal si existe
-                                val_str = val_str.split('.')[0]
-                                # Rellenar a 9 dígitos si es necesario
-                                if len(val_str) < 9:
-                                    val_str = val_str.zfill(9)
-                            return val_str
-                        
-                        df_existing['Depósito'] = df_existing['Depósito'].apply(fix_deposito_format)
+                        df_existing['Depósito'] = self.normalize_deposito_series(df_existing['Depósito'])
                     
                     # Si Excel existente no tiene 'Tipo', agregarlo y rellenar
                     if 'Tipo' not in df_existing.columns:
                         # Inferir Tipo de campos existentes
-                        df_existing['Tipo'] = df_existing.apply(
-                            lambda row: 'Gpo' if pd.notna(row.get('Ahorro', 0)) and float(row.get('Ahorro', 0)) > 0 
-                                       else 'Ind', axis=1
-                        )
+                        df_existing['Tipo'] = self.infer_tipo_series(df_existing)
                     
                     # Si Excel existente no tiene 'Ciclo', agregarlo con valor por defecto "01"
                     if 'Ciclo' not in df_existing.columns:
@@ -1074,23 +1434,13 @@ class PaymentManager:
                     # Procesar columna 'Pago semanal' para Excel existente
                     if 'Pago semanal' not in df_existing.columns:
                         # Agregar columna aplicando lookup si hay diccionarios cargados
-                        df_existing['Pago semanal'] = df_existing.apply(
-                            lambda row: self.get_pago_semanal(
-                                str(row.get('ID', '')).zfill(6),
-                                str(row.get('Tipo', 'Ind')).strip()
-                            ), axis=1
-                        )
+                        df_existing['Pago semanal'] = self.map_pago_semanal(df_existing)
                         logging.info("Columna 'Pago semanal' agregada a Excel existente")
                     else:
                         # Actualizar valores faltantes o "No encontrado" si hay nuevos datos cargados
                         mask = (df_existing['Pago semanal'].isna()) | (df_existing['Pago semanal'] == '') | (df_existing['Pago semanal'] == 'No encontrado')
                         if mask.any():
-                            df_existing.loc[mask, 'Pago semanal'] = df_existing.loc[mask].apply(
-                                lambda row: self.get_pago_semanal(
-                                    str(row.get('ID', '')).zfill(6),
-                                    str(row.get('Tipo', 'Ind')).strip()
-                                ), axis=1
-                            )
+                            df_existing.loc[mask, 'Pago semanal'] = self.map_pago_semanal(df_existing.loc[mask])
                             logging.info(f"Columna 'Pago semanal' actualizada para {mask.sum()} registros existentes")
                     
                     # Calcular columna 'Monto Banco' para Excel existente (por ahora igual a Total)
@@ -1217,137 +1567,54 @@ class PaymentManager:
             
             logging.info(f"Guardando {len(df_final)} registros en {self.excel_path}")
             
-            # Asegurar que Depósito sea string para preservar ceros a la izquierda
+            # Asegurar que Depósito sea string de 9 dígitos para preservar ceros a la izquierda
             if 'Depósito' in df_final.columns:
-                df_final['Depósito'] = df_final['Depósito'].astype(str)
-            
-            # Crear ExcelWriter y agregar ambas hojas
-            with pd.ExcelWriter(self.excel_path, engine='openpyxl') as writer:
-                df_final.to_excel(writer, sheet_name='Pagos', index=False)
-                # Crear hoja Meta vacía
-                df_meta = pd.DataFrame({'ultimo_timestamp': ['']})
-                df_meta.to_excel(writer, sheet_name='Meta', index=False)
+                df_final['Depósito'] = df_final['Depósito'].astype(str).str.zfill(9)
             
-            # Configurar formato de Excel y ocultar Meta con retries
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    wb = openpyxl.load_workbook(self.excel_path)
-                    
-                    # Configurar columnas ID, Ciclo y Depósito como texto para preservar formato (ceros a la izquierda)
-                    if 'Pagos' in wb.sheetnames:
-                        ws = wb['Pagos']
-                        for cell in ws[1]:  # Primera fila (encabezados)
-                            if cell.value == 'ID':
-                                col_letter = cell.column_letter
-                                # Formatear todas las celdas de la columna ID como texto
-                                for row in range(2, ws.max_row + 1):
-                                    ws[f'{col_letter}{row}'].number_format = '@'  # @ = texto
-                            elif cell.value == 'Ciclo':
-                                col_letter = cell.column_letter
-                                # Formatear todas las celdas de la columna Ciclo como texto
-                                for row in range(2, ws.max_row + 1):
-                                    ws[f'{col_letter}{row}'].number_format = '@'  # @ = texto
-                            elif cell.value == 'Depósito':
-                                col_letter = cell.column_letter
-                                # Formatear todas las celdas de la columna Depósito como texto
-                                for row in range(2, ws.max_row + 1):
-                                    cell_ref = ws[f'{col_letter}{row}']
-                                    cell_ref.number_format = '@'  # @ = texto
-                                    # Asegurar que el valor se guarde como string (preserva ceros a la izquierda)
-                                    if cell_ref.value is not None:
-                                        # Convertir a string, preservando formato completo con ceros
-                                        dep_value = str(cell_ref.value)
-                                        # Si el valor es numérico y empieza con 0, preservarlo
-                                        if dep_value.isdigit() and len(dep_value) == 9:
-                                            # Ya tiene formato correcto (9 dígitos: tipo(1) + ID(6) + Ciclo(2))
-                                            cell_ref.value = dep_value
-                                        else:
-                                            # Normalizar a string asegurando formato completo
-                                            cell_ref.value = str(cell_ref.value).zfill(9) if len(str(cell_ref.value)) < 9 else str(cell_ref.value)
-                            
-                            # Formatear columnas numéricas: Monto Banco, Pago real, Ahorro real
-                            elif cell.value == 'Monto Banco':
-                                col_letter = cell.column_letter
-                                # Formato numérico con 2 decimales
-                                for row in range(2, ws.max_row + 1):
-                                    ws[f'{col_letter}{row}'].number_format = '#,##0.00'
-                            
-                            elif cell.value == 'Pago real':
-                                col_letter = cell.column_letter
-                                
-                                # Color verde para suficiente pago, rojo para insuficiente
-                                fill_verde = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-                                fill_rojo = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-                                
-                                # Obtener índices de columnas para comparación
-                                monto_banco_col = None
-                                pago_semanal_col = None
-                                for header_cell in ws[1]:
-                                    if header_cell.value == 'Monto Banco':
-                                        monto_banco_col = header_cell.column
-                                    elif header_cell.value == 'Pago semanal':
-                                        pago_semanal_col = header_cell.column
-                                
-                                # Aplicar formato y color a cada celda
-                                for row in range(2, ws.max_row + 1):
-                                    cell_ref = ws[f'{col_letter}{row}']
-                                    cell_ref.number_format = '#,##0.00'
-                                    
-                                    # Solo aplicar color si la celda tiene valor
-                                    if cell_ref.value is not None:
-                                        try:
-                                            pago_real_val = float(cell_ref.value)
-                                            
-                                            # Obtener valores de Monto Banco y Pago semanal para comparar
-                                            if monto_banco_col and pago_semanal_col:
-                                                monto_banco_cell = ws.cell(row=row, column=monto_banco_col)
-                                                pago_semanal_cell = ws.cell(row=row, column=pago_semanal_col)
-                                                
-                                                if monto_banco_cell.value is not None and pago_semanal_cell.value is not None:
-                                                    try:
-                                                        monto_banco_val = float(monto_banco_cell.value)
-                                                        pago_semanal_val = float(pago_semanal_cell.value)
-                                                        
-                                                        # Comparar y aplicar color
-                                                        if monto_banco_val >= pago_semanal_val:
-                                                            cell_ref.fill = fill_verde
-                                                        else:
-                                                            cell_ref.fill = fill_rojo
-                                                    except (ValueError, TypeError):
-                                                        pass
-                                        except (ValueError, TypeError):
-                                            pass
-                            
-                            elif cell.value == 'Ahorro real':
-                                col_letter = cell.column_letter
-                                # Formato numérico con 2 decimales
-                                for row in range(2, ws.max_row + 1):
-                                    ws[f'{col_letter}{row}'].number_format = '#,##0.00'
-                    
-                    # Ocultar hoja Meta
-                    if 'Meta' in wb.sheetnames and len(wb.sheetnames) > 1:
-                        meta_idx = wb.sheetnames.index('Meta')
-                        wb.worksheets[meta_idx].sheet_state = 'hidden'
+            # Escribir ambas hojas, con formato y Meta oculta, en una sola pasada sobre un archivo
+            # temporal; luego se reemplaza el Excel de una vez (si está abierto en Excel solo se
+            # reintenta el reemplazo, sin volver a generar el libro)
+            root, ext = os.path.splitext(self.excel_path)
+            tmp_path = f"{root}.tmp{ext}"
+            # El temporal se borra si algo falla antes de reemplazar el Excel
+            try:
+                with pd.ExcelWriter(tmp_path, engine=_WRITE_ENGINE) as writer:
+                    df_final.to_excel(writer, sheet_name='Pagos', index=False)
+                    # Hoja Meta vacía: no se guarda un timestamp global, porque descartaría
+                    # chats distintos cuyo último mensaje sea anterior
+                    df_meta = pd.DataFrame({'ultimo_timestamp': ['']})
+                    df_meta.to_excel(writer, sheet_name='Meta', index=False)
                     
-                    wb.save(self.excel_path)
-                    wb.close()
-                    break
-                except PermissionError as pe:
-                    if attempt < max_retries - 1:
-                        logging.warning(f"Intento {attempt + 1} de {max_retries}: Permiso denegado. Esperando...")
-                        time.sleep(1)
-                    else:
-                        logging.error(f"NO se pudo guardar Excel tras {max_retries} intentos. Cierra el archivo en Excel.")
-                        raise
-                except Exception as meta_error:
-                    logging.warning(f"No se pudo configurar formato del Excel: {meta_error}")
-                    break
+                    try:
+                        # Formato de la hoja Pagos y ocultar hoja Meta
+                        if _WRITE_ENGINE == 'xlsxwriter':
+                            self._format_pagos_xlsxwriter(writer, df_final)
+                            writer.sheets['Meta'].hide()
+                        else:
+                            self._format_pagos_sheet(writer.sheets['Pagos'])
+                            writer.sheets['Meta'].sheet_state = 'hidden'
+                    except Exception as meta_error:
+                        logging.warning(f"No se pudo configurar formato del Excel: {meta_error}")
+                
+                max_retries = 3
+                for attempt in range(max_retries):
+                    try:
+                        os.replace(tmp_path, self.excel_path)
+                        break
+                    except PermissionError:
+                        if attempt < max_retries - 1:
+                            logging.warning(f"Intento {attempt + 1} de {max_retries}: Permiso denegado. Esperando...")
+                            time.sleep(1)
+                        else:
+                            logging.error(f"NO se pudo guardar Excel tras {max_retries} intentos. Cierra el archivo en Excel.")
+                            raise
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             
             logging.info(f"Guardado exitoso: {len(df_final)} registros")
             return len(df_final)
         except Exception as e:
-            import traceback
             logging.error(f"Error agregando a Excel: {e}")
             logging.error(traceback.format_exc())
             return 0
@@ -1357,38 +1624,46 @@ class PaymentManager:
         Procesa archivo de confirmaciones y actualiza registros en Excel
         Retorna: (lista de confirmaciones procesadas, lista de alertas de no encontrados)
         """
+        return self.process_confirmations_batch([filepath])
+    
+    def read_confirmations(self, filepath: str, corte: str = None) -> List[Dict]:
+        """Extrae las confirmaciones de un archivo, sin duplicados"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            text = f.read()
+        
+        filename = os.path.basename(filepath)
+        entries = self.extract_all_payments_from_text(text, filename, corte)
+        
+        # Eliminar duplicados
+        return _unique_entries(entries, _CONFIRMATION_KEY)
+    
+    @synchronized
+    def process_confirmations_batch(self, filepaths: List[str]) -> Tuple[List[Dict], List[str]]:
+        """
+        Procesa varios archivos de confirmaciones abriendo y guardando el Excel una sola vez
+        Retorna: (lista de confirmaciones procesadas, lista de alertas de no encontrados)
+        """
         alerts = []
         confirmed_entries = []
+        entries = []
         
-        # Procesar archivo de confirmaciones directamente (sin filtro de timestamp)
+        # Procesar archivos de confirmaciones directamente (sin filtro de timestamp)
         # Obtener corte horario actual para las confirmaciones
         corte_actual = self.get_current_corte()
         
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = []
-                for line in f:
-                    lines.append(line.rstrip('\n\r'))
-            
-            filename = os.path.basename(filepath)
-            entries = self.extract_all_payments_from_lines(lines, filename, corte_actual)
-            
-            # Eliminar duplicados
-            seen = set()
-            unique_entries = []
-            for entry in entries:
-                key = f"{entry['ID']}_{entry['Grupo']}_{entry['Pago']}_{entry['Ahorro']}"
-                if key not in seen:
-                    seen.add(key)
-                    unique_entries.append(entry)
+        for filepath in filepaths:
+            try:
+                file_entries = self.read_confirmations(filepath, corte_actual)
+            except Exception as e:
+                logging.error(f"Error leyendo confirmaciones: {e}")
+                alerts.append(f"Error leyendo archivo de confirmaciones: {e}")
+                continue
             
-            entries = unique_entries
-        except Exception as e:
-            logging.error(f"Error leyendo confirmaciones: {e}")
-            alerts.append(f"Error leyendo archivo de confirmaciones: {e}")
+            if not file_entries:
+                alerts.append("No se encontraron confirmaciones válidas en el archivo")
+            entries.extend(file_entries)
         
         if not entries:
-            alerts.append("No se encontraron confirmaciones válidas en el archivo")
             return [], alerts
         
         # Verificar que existe el Excel
@@ -1401,105 +1676,124 @@ class PaymentManager:
             df_pagos = pd.read_excel(
                 self.excel_path, 
                 sheet_name='Pagos', 
-                engine='openpyxl',
-                dtype={'ID': str, 'Ciclo': str, 'Depósito': str}
+                engine=self.READ_ENGINE,
+                dtype=self.TEXT_DTYPES
             )
             
             # Normalizar Depósito (ya es string, solo asegurar formato)
             if 'Depósito' in df_pagos.columns:
-                df_pagos['Depósito'] = df_pagos['Depósito'].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '').str.replace('None', '')
                 # Asegurar formato completo de 9 dígitos
-                def fix_deposito(val):
-                    if pd.isna(val) or val == '' or val == 'nan' or val == 'None':
-                        return None
-                    val_str = str(val).strip()
-                    if val_str.replace('.', '').isdigit():
-                        val_str = val_str.split('.')[0]
-                        if len(val_str) < 9:
-                            val_str = val_str.zfill(9)
-                    return val_str
-                df_pagos['Depósito'] = df_pagos['Depósito'].apply(fix_deposito)
+                df_pagos['Depósito'] = self.normalize_deposito_series(df_pagos['Depósito'])
+            
+            # Índice (Tipo, ID, Grupo) -> filas en orden, para no recorrer Pagos completo por
+            # cada confirmación (esas columnas no cambian al confirmar)
+            # Las claves se arman por columna; el bucle solo reparte las filas
+            if 'Tipo' in df_pagos.columns:
+                tipos = df_pagos['Tipo'].astype(str).str.strip().where(df_pagos['Tipo'].notna(), 'Gpo')
+            else:
+                tipos = pd.Series('Gpo', index=df_pagos.index)
+            # Convertir ID a string y rellenar con ceros para comparación
+            ids = df_pagos['ID'].astype(str).str.replace('.0', '', regex=False).str.zfill(6).where(df_pagos['ID'].notna(), '')
+            # Grupo se compara sin distinguir mayúsculas
+            grupos = df_pagos['Grupo'].astype(str).str.strip().str.upper().where(df_pagos['Grupo'].notna(), '')
+            row_index = {}
+            for idx, key in zip(df_pagos.index, zip(tipos.tolist(), ids.tolist(), grupos.tolist())):
+                row_index.setdefault(key, []).append(idx)
+            
+            # Pago y Ahorro por fila: los candidatos se comparan sin armar la fila completa
+            pagos_excel = dict(zip(df_pagos.index, df_pagos['Pago']))
+            ahorros_excel = dict(zip(df_pagos.index, df_pagos['Ahorro']))
+            
+            # Cambios por fila {idx: {columna: valor}}; se escriben juntos al terminar
+            updates = {}
+            # Filas confirmadas, en orden, y los cambios que tenía cada una al confirmarse
+            confirmed_rows = []
+            confirmed_changes = []
             
             for conf_entry in entries:
-                match_found = False
                 conf_tipo = conf_entry.get('Tipo', 'Gpo')  # Por defecto Gpo si no viene
-                logging.info(f"Buscando confirmación: Tipo={conf_tipo}, ID={conf_entry['ID']}, Grupo={conf_entry['Grupo']}, "
-                           f"Pago={conf_entry['Pago']}, Ahorro={conf_entry['Ahorro']}")
+                # Formato diferido (%s): el mensaje solo se arma si el registro se emite
+                logging.info("Buscando confirmación: Tipo=%s, ID=%s, Grupo=%s, Pago=%s, Ahorro=%s",
+                             conf_tipo, conf_entry['ID'], conf_entry['Grupo'], conf_entry['Pago'], conf_entry['Ahorro'])
                 
                 # Buscar coincidencia en df_pagos con Tipo + ID + Grupo + Pago + Ahorro
-                for idx in df_pagos.index:
-                    row = df_pagos.iloc[idx]
-                    
-                    # Comparar Tipo
-                    excel_tipo = str(row.get('Tipo', 'Gpo')).strip() if pd.notna(row.get('Tipo')) else 'Gpo'
-                    if excel_tipo != conf_tipo:
-                        continue
-                    
-                    # Convertir ID a string y rellenar con ceros para comparación
-                    excel_id = str(row['ID']).replace('.0', '').zfill(6) if pd.notna(row['ID']) else ''
-                    conf_id = str(conf_entry['ID']).strip().zfill(6)
-                    
-                    # Comparar ID
-                    if excel_id != conf_id:
-                        continue
-                    
-                    # Comparar Grupo (case-insensitive)
-                    excel_grupo = str(row['Grupo']).strip().upper() if pd.notna(row['Grupo']) else ''
-                    conf_grupo = str(conf_entry['Grupo']).strip().upper()
-                    if excel_grupo != conf_grupo:
-                        continue
-                    
+                conf_id = str(conf_entry['ID']).strip().zfill(6)
+                conf_grupo = str(conf_entry['Grupo']).strip().upper()
+                conf_pago = float(conf_entry['Pago'])
+                conf_ahorro = float(conf_entry['Ahorro'])
+                for idx in row_index.get((conf_tipo, conf_id, conf_grupo), ()):
                     # Comparar Pago con tolerancia 0.01
-                    excel_pago = float(row['Pago']) if pd.notna(row['Pago']) else 0.0
-                    conf_pago = float(conf_entry['Pago'])
+                    excel_pago = pagos_excel[idx]
+                    excel_pago = float(excel_pago) if pd.notna(excel_pago) else 0.0
                     if abs(excel_pago - conf_pago) > 0.01:
-                        logging.warning(f"Discrepancia en Pago para ID {conf_id}: "
-                                      f"Excel={excel_pago} vs Confirmación={conf_pago}")
+                        logging.warning("Discrepancia en Pago para ID %s: Excel=%s vs Confirmación=%s",
+                                        conf_id, excel_pago, conf_pago)
                         continue
                     
-                    # Comparar Ahorro con tolerancia 0.01
-                    excel_ahorro = float(row['Ahorro']) if pd.notna(row['Ahorro']) else 0.0
-                    conf_ahorro = float(conf_entry['Ahorro'])
-                    if abs(excel_ahorro - conf_ahorro) > 0.01:
-                        logging.warning(f"Discrepancia en Ahorro para ID {conf_id}: "
-                                      f"Excel={excel_ahorro} vs Confirmación={conf_ahorro}")
+                    # Comparar Ahorro con tolerancia 0.01 (con el valor ya corregido en este lote, si lo hay)
+                    excel_ahorro = updates.get(idx, {}).get('Ahorro', ahorros_excel[idx])
+                    excel_ahorro = float(excel_ahorro) if pd.notna(excel_ahorro) else 0.0
+                    ahorro_difiere = abs(excel_ahorro - conf_ahorro) > 0.01
+                    if ahorro_difiere:
+                        logging.warning("Discrepancia en Ahorro para ID %s: Excel=%s vs Confirmación=%s",
+                                        conf_id, excel_ahorro, conf_ahorro)
                     
                     # Match completo encontrado
-                    logging.info(f"MATCH ENCONTRADO: Tipo={excel_tipo}, ID={conf_id}, Grupo={conf_grupo}")
-                    match_found = True
+                    logging.info("MATCH ENCONTRADO: Tipo=%s, ID=%s, Grupo=%s", conf_tipo, conf_id, conf_grupo)
                     
                     # Actualizar a "Sí" en columna Confirmado
-                    df_pagos.at[idx, 'Confirmado'] = 'Sí'
+                    row_updates = updates.setdefault(idx, {})
+                    row_updates['Confirmado'] = 'Sí'
                     
                     # Actualizar Ahorro si difiere
-                    if abs(excel_ahorro - conf_ahorro) > 0.01:
-                        df_pagos.at[idx, 'Ahorro'] = conf_ahorro
-                        df_pagos.at[idx, 'Total'] = excel_pago + conf_ahorro
+                    if ahorro_difiere:
+                        row_updates['Ahorro'] = conf_ahorro
+                        row_updates['Total'] = excel_pago + conf_ahorro
                     
-                    # Copiar registro completo para hoja de confirmados
-                    confirmed_entry = df_pagos.iloc[idx].to_dict()
-                    confirmed_entries.append(confirmed_entry)
+                    # Registro para hoja de confirmados (se copia junto con los demás al terminar)
+                    confirmed_rows.append(idx)
+                    confirmed_changes.append(dict(row_updates))
                     
                     break
-                
-                if not match_found:
+                else:
+                    # Ningún candidato coincidió
                     alerts.append(
                         f"No se encontró: ID {conf_entry['ID']}, Grupo {conf_entry['Grupo']}, "
                         f"Pago {conf_entry['Pago']}, Ahorro {conf_entry['Ahorro']}"
                     )
             
+            # Registros completos para hoja de confirmados: una sola selección de filas, con los
+            # cambios vigentes al confirmar cada una (una fila puede confirmarse más de una vez)
+            df_confirmed = None
+            if confirmed_rows:
+                df_confirmed = df_pagos.loc[confirmed_rows].reset_index(drop=True)
+                changes = pd.DataFrame(confirmed_changes)
+                for col in changes.columns:
+                    if col in df_confirmed.columns:
+                        df_confirmed[col] = changes[col].where(changes[col].notna(), df_confirmed[col])
+                    else:
+                        df_confirmed[col] = changes[col]
+                confirmed_entries = df_confirmed.to_dict('records')
+            
+            # Escribir los cambios por columna en lugar de celda por celda
+            if updates:
+                df_pagos.loc[list(updates), 'Confirmado'] = 'Sí'
+                ahorro_rows = [idx for idx, changes in updates.items() if 'Ahorro' in changes]
+                if ahorro_rows:
+                    for col in ('Ahorro', 'Total'):
+                        df_pagos.loc[ahorro_rows, col] = pd.Series(
+                            [updates[idx][col] for idx in ahorro_rows], index=ahorro_rows)
+            
             # Asegurar que Depósito sea string antes de guardar
             if 'Depósito' in df_pagos.columns:
                 df_pagos['Depósito'] = df_pagos['Depósito'].astype(str).str.replace('.0', '', regex=False)
             
-            # Guardar cambios en hoja Pagos
+            # Guardar Pagos (con su formato) y Pagos Confirmados en una sola apertura del libro
             with pd.ExcelWriter(self.excel_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
                 df_pagos.to_excel(writer, sheet_name='Pagos', index=False)
-            
-            # Configurar formato de Depósito como texto en Excel
-            wb = openpyxl.load_workbook(self.excel_path)
-            if 'Pagos' in wb.sheetnames:
-                ws = wb['Pagos']
+                
+                # Configurar formato de Depósito como texto en Excel
+                ws = writer.sheets['Pagos']
                 for cell in ws[1]:  # Primera fila (encabezados)
                     if cell.value == 'Depósito':
                         col_letter = cell.column_letter
@@ -1518,37 +1812,32 @@ class PaymentManager:
                                     cell_ref.value = dep_value
                                 else:
                                     cell_ref.value = dep_value
-            wb.save(self.excel_path)
-            wb.close()
-            
-            # Actualizar hoja Pagos Confirmados
-            if confirmed_entries:
-                df_confirmed = pd.DataFrame(confirmed_entries)
-                
-                # Intentar leer confirmados existentes
-                try:
-                    df_existing_confirmed = pd.read_excel(
-                        self.excel_path, sheet_name='Pagos Confirmados', engine='openpyxl'
-                    )
-                    # Combinar con los nuevos
-                    df_confirmed = pd.concat([df_existing_confirmed, df_confirmed])
-                except:
-                    pass
                 
-                # Guardar hoja de confirmados
-                with pd.ExcelWriter(self.excel_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                if df_confirmed is not None:
+                    # Confirmados anteriores: se toman del libro que el writer ya tiene abierto,
+                    # sin volver a leer el archivo
+                    if 'Pagos Confirmados' in writer.book.sheetnames:
+                        filas = writer.book['Pagos Confirmados'].values
+                        encabezados = next(filas, None)
+                        if encabezados is not None:
+                            df_existing_confirmed = pd.DataFrame(list(filas), columns=encabezados)
+                            # Combinar con los nuevos
+                            df_confirmed = pd.concat([df_existing_confirmed, df_confirmed], ignore_index=True)
+                    
+                    # Guardar hoja de confirmados
                     df_confirmed.to_excel(writer, sheet_name='Pagos Confirmados', index=False)
-                
+            
+            if confirmed_entries:
                 logging.info(f"Confirmados {len(confirmed_entries)} pagos")
             
         except Exception as e:
-            import traceback
             logging.error(f"Error procesando confirmaciones: {e}")
             logging.error(traceback.format_exc())
             alerts.append(f"Error procesando confirmaciones: {str(e)}")
         
         return confirmed_entries, alerts
     
+    @synchronized
     def clear_all_data(self) -> bool:
         """
         Limpia todos los registros del sistema
@@ -1557,9 +1846,11 @@ class PaymentManager:
         """
         errors = []
         
-        # Eliminar archivo Excel con retries
+        # Eliminar archivo Excel con retries (esperas crecientes: un bloqueo breve se libera
+        # pronto y uno de Excel no se libera esperando más)
         if os.path.exists(self.excel_path):
-            max_retries = 3
+            esperas = (0.05, 0.1, 0.2)
+            max_retries = len(esperas) + 1
             for attempt in range(max_retries):
                 try:
                     os.remove(self.excel_path)
@@ -1568,7 +1859,7 @@ class PaymentManager:
                 except PermissionError as pe:
                     if attempt < max_retries - 1:
                         logging.warning(f"Intento {attempt + 1} de {max_retries}: Permiso denegado. Esperando...")
-                        time.sleep(1)
+                        time.sleep(esperas[attempt])
                     else:
                         errors.append(f"NO se pudo eliminar {self.excel_path} tras {max_retries} intentos (archivo abierto en Excel)")
                 except Exception as e:
@@ -1586,6 +1877,7 @@ class PaymentManager:
                 },
                 "mapeo_id_grupos": {}
             }
+            self._group_info_cache = {}
             self.save_config()
             logging.info("Config.json limpiado")
         except Exception as e: